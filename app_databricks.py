@@ -1,11 +1,34 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from databricks import sql
 import os
-from datetime import datetime
+import re
+import bisect
+import functools
+import hashlib
+import json
+import sys
+import threading
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from error_patterns import (
+    NO_ERROR_PATTERN, NO_ERROR_PATTERN_ID, UNCLASSIFIED_PATTERN, UNCLASSIFIED_PATTERN_ID,
+    PATTERNS_TABLE, classify_error_messages
+)
 import plotly.express as px
 import plotly.graph_objects as go
 
+# Copy-on-Write (always on from pandas 3): row subsets of the cached frames
+# stay views until a column is written
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # Page configuration
 st.set_page_config(
     page_title="Hold Busters Dashboard",
@@ -54,26 +77,668 @@ def get_databricks_connection():
         st.info("Please configure your Databricks credentials in .streamlit/secrets.toml")
         return None
 
+# Local backend: the same queries against an embedded DuckDB copy of the data
+@st.cache_resource
+def get_local_connection(data_dir="."):
+    """
+    Load the bundled CSV exports (or a scale-mode output directory) into a
+    local DuckDB database with the Databricks connector's cursor interface
+    """
+    try:
+        from local_backend import connect_local
+    except ImportError as e:
+        st.error(f"Failed to load the local backend: {str(e)}")
+        st.info("The local backend needs DuckDB: pip install duckdb")
+        return None
+    try:
+        return connect_local(data_dir)
+    except Exception as e:
+        st.error(f"Failed to load local data from '{data_dir}': {str(e)}")
+        return None
+
+def get_backend():
+    """
+    Return ``(backend, data_dir)``. ``HOLD_BUSTERS_BACKEND=local`` (checked
+    first, so no secrets.toml is needed offline) or a ``[local]`` section in
+    secrets.toml selects the local backend; Databricks is the default.
+    """
+    backend = os.getenv("HOLD_BUSTERS_BACKEND")
+    if backend:
+        return backend.lower(), os.getenv("HOLD_BUSTERS_DATA_DIR", ".")
+    if hasattr(st, 'secrets') and 'local' in st.secrets:
+        return "local", st.secrets.local.get('data_dir', '.')
+    return "databricks", "."
+
+def get_connection(backend="databricks", data_dir="."):
+    """Connection for the selected backend; both expose the same cursor interface"""
+    if backend == "local":
+        return get_local_connection(data_dir)
+    return get_databricks_connection()
+
+# Performance instrumentation
+# Each script run records its queries and major render sections (wall time,
+# rows, Arrow bytes, cache hit/miss) for the sidebar "Performance" panel.
+# With HOLD_BUSTERS_PERF_LOG set, every run is also appended to that file
+# as JSON lines. Cached functions run in the session's script thread, so a
+# thread-local holds the current run. Cached query functions are wrapped by
+# timed_query outside their cache decorator, so in-memory hits are recorded too.
+PERF_LOG_FILE = os.getenv("HOLD_BUSTERS_PERF_LOG")
+PERF_HISTORY_RUNS = 20
+PERF_QUERY_LAYER = {
+    'query_databricks', 'query_disk_cached', 'execute_statement', 'fetch_arrow',
+    'fetch_changed_rows', 'table_high_water_mark', 'record_query', 'query_caller'
+}
+# Cache states of queries that reached the warehouse
+PERF_WAREHOUSE_CACHE = ['miss', 'delta', 'uncached']
+# A call's cache state is its most expensive inner query's
+PERF_CACHE_PRIORITY = ['miss', 'delta', 'uncached', 'disk', 'hit']
+# DataFrame.attrs key holding the Arrow size of a fetched result (kept through st.cache_data)
+PERF_BYTES_ATTR = 'arrow_bytes'
+_perf_run = threading.local()
+
+def start_perf_run():
+    """Start recording a script run"""
+    _perf_run.run_id = uuid.uuid4().hex[:8]
+    _perf_run.started = time.perf_counter()
+    _perf_run.records = []
+    _perf_run.sections = []
+    _perf_run.calls = []
+
+def query_caller():
+    """Name of the app function that issued the current query (e.g. get_invoice_kpis)"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__ and code.co_name not in PERF_QUERY_LAYER:
+            return code.co_name
+        frame = frame.f_back
+    return None
+
+def record_perf(kind, name, seconds, **fields):
+    """Append one record to the current run (a no-op outside a recorded run)"""
+    records = getattr(_perf_run, 'records', None)
+    if records is None:
+        return
+    records.append({
+        'run': _perf_run.run_id,
+        'time': datetime.now().isoformat(timespec='milliseconds'),
+        'kind': kind,
+        'name': name,
+        'section': _perf_run.sections[-1] if _perf_run.sections else None,
+        'seconds': round(seconds, 4),
+        **fields
+    })
+
+def report_query(name, seconds, rows=None, bytes=None, cache=None, error=None):
+    """Hand a query record to the enclosing timed_query call, or record it for the run"""
+    calls = getattr(_perf_run, 'calls', None)
+    if calls:
+        calls[-1].append({'rows': rows, 'bytes': bytes, 'cache': cache, 'error': error})
+    else:
+        record_perf('query', name, seconds, rows=rows, bytes=bytes, cache=cache, error=error)
+
+def record_query(started, cache, table=None, rows=None, error=None):
+    """Record a query that started at ``started`` (perf_counter) and returned ``table``"""
+    report_query(
+        query_caller() or 'query', time.perf_counter() - started,
+        rows=table.num_rows if table is not None else rows,
+        bytes=table.nbytes if table is not None else None,
+        cache=cache, error=error
+    )
+
+def arrow_to_pandas(table):
+    """Convert a fetched Arrow table, keeping its size for the records of later cache hits"""
+    df = table.to_pandas()
+    df.attrs[PERF_BYTES_ATTR] = table.nbytes
+    return df
+
+def timed_query(func):
+    """
+    Record every call of a cached query function. Apply it above
+    st.cache_data/st.cache_resource: a call whose cached body issued no
+    query is a cache hit; otherwise the inner queries are rolled up into it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        calls = getattr(_perf_run, 'calls', None)
+        if calls is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        inner = []
+        calls.append(inner)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            calls.pop()
+        
+        if inner:
+            report_query(
+                func.__name__, time.perf_counter() - started,
+                rows=sum(r['rows'] or 0 for r in inner),
+                bytes=sum(r['bytes'] or 0 for r in inner),
+                cache=min((r['cache'] for r in inner), key=PERF_CACHE_PRIORITY.index),
+                error=next((r['error'] for r in inner if r['error']), None)
+            )
+        else:
+            is_frame = isinstance(result, pd.DataFrame)
+            report_query(
+                func.__name__, time.perf_counter() - started,
+                rows=len(result) if is_frame else None,
+                bytes=result.attrs.get(PERF_BYTES_ATTR) if is_frame else None,
+                cache='hit'
+            )
+        return result
+    
+    wrapper.clear = func.clear
+    return wrapper
+
+@contextmanager
+def perf_section(name):
+    """
+    Record a render section. Yields a dict; keys set on it (e.g. ``detail``)
+    are added to the record. The section counts as a cache hit when none of
+    its queries reached the warehouse.
+    """
+    records = getattr(_perf_run, 'records', None)
+    if records is None:
+        yield {}
+        return
+    first = len(records)
+    started = time.perf_counter()
+    extra = {}
+    _perf_run.sections.append(name)
+    try:
+        yield extra
+    finally:
+        _perf_run.sections.pop()
+        queries = [r for r in records[first:] if r['kind'] == 'query']
+        record_perf(
+            'section', name, time.perf_counter() - started,
+            rows=sum(r['rows'] or 0 for r in queries),
+            bytes=sum(r['bytes'] or 0 for r in queries),
+            cache='miss' if any(r['cache'] in PERF_WAREHOUSE_CACHE for r in queries) else 'hit',
+            queries=len(queries), **extra
+        )
+
+def render_perf_panel():
+    """Show this run's records in the sidebar, keep the session history and write the log"""
+    records = getattr(_perf_run, 'records', None)
+    if records is None:
+        return
+    record_perf('run', 'script run', time.perf_counter() - _perf_run.started, queries=sum(r['kind'] == 'query' for r in records))
+    history = st.session_state.setdefault('perf_history', [])
+    history.append(records)
+    del history[:-PERF_HISTORY_RUNS]
+    
+    if PERF_LOG_FILE:
+        try:
+            with open(PERF_LOG_FILE, 'a', encoding='utf-8') as log:
+                log.writelines(json.dumps(record, default=str) + "\n" for record in records)
+        except OSError as e:
+            st.sidebar.warning(f"Could not write performance log: {str(e)}")
+    
+    perf_df = pd.DataFrame(records)
+    queries = perf_df[perf_df['kind'] == 'query']
+    with st.sidebar.expander("⏱️ Performance"):
+        st.caption(
+            f"This run: {records[-1]['seconds']:.2f}s, {len(queries)} queries "
+            f"({int(queries['cache'].isin(PERF_WAREHOUSE_CACHE).sum()) if not queries.empty else 0} from the warehouse), "
+            f"{int(queries['rows'].fillna(0).sum()) if not queries.empty else 0:,} rows, "
+            f"{(queries['bytes'].fillna(0).sum() if not queries.empty else 0) / 1e6:.1f} MB"
+        )
+        columns = [col for col in ['kind', 'name', 'section', 'seconds', 'rows', 'bytes', 'cache', 'queries', 'detail', 'error'] if col in perf_df.columns]
+        st.dataframe(
+            perf_df[columns].sort_values('seconds', ascending=False),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            label="📥 Download session log (JSON lines)",
+            data="".join(json.dumps(record, default=str) + "\n" for run in history for record in run),
+            file_name=f"hold_busters_perf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+            mime="application/x-ndjson",
+            key="perf_log_download"
+        )
+
+# Sampling profiler
+# Opt-in with ?profile=1 in the URL or HOLD_BUSTERS_PROFILE=1. A background
+# thread samples the script thread's stack, so time spent inside pandas,
+# pyarrow and plotly is attributed to the app code that called it.
+PROFILE_ENV_VAR = "HOLD_BUSTERS_PROFILE"
+PROFILE_INTERVAL_SECONDS = float(os.getenv("HOLD_BUSTERS_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_TOP_FUNCTIONS = 20
+
+def profiling_enabled():
+    """Profile this run? (``?profile=1`` or HOLD_BUSTERS_PROFILE=1)"""
+    flag = st.query_params.get("profile") or os.getenv(PROFILE_ENV_VAR, "")
+    return flag.lower() in ("1", "true", "yes", "on")
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack every ``interval`` seconds via
+    sys._current_frames(). Stacks are cut at this script's module frame, so
+    Streamlit's runner frames don't show up. Each sample is weighted by the
+    time since the previous one, which keeps totals right when the GIL
+    delays the sampler.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks = defaultdict(float)  # (frame key, ...) root first -> seconds
+        self.samples = 0
+        self.seconds = 0.0
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="hold-busters-profiler", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.seconds = time.perf_counter() - self._started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            now = time.perf_counter()
+            stack = self._stack(frame)
+            if stack:
+                self.stacks[stack] += now - last
+                self.samples += 1
+            last = now
+
+    @staticmethod
+    def _stack(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            if code.co_filename == __file__ and code.co_name == '<module>':
+                return tuple(reversed(stack))
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _label(frame_key):
+        name, filename, line = frame_key
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format (flamegraph.pl, speedscope, inferno), in milliseconds"""
+        return "".join(
+            ";".join(self._label(frame) for frame in stack) + f" {max(1, round(seconds * 1000))}\n"
+            for stack, seconds in self.stacks.items()
+        )
+
+    def speedscope(self, name):
+        """A speedscope.app 'sampled' profile, weighted in milliseconds"""
+        frames, frame_index, samples, weights = [], {}, [], []
+        for stack, seconds in self.stacks.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(seconds * 1000)
+        return json.dumps({
+            '$schema': "https://www.speedscope.app/file-format-schema.json",
+            'name': name,
+            'exporter': "Hold Busters Dashboard",
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }]
+        })
+
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """Functions by self time (leaf of the stack) with their total (inclusive) time"""
+        self_seconds, total_seconds = defaultdict(float), defaultdict(float)
+        for stack, seconds in self.stacks.items():
+            self_seconds[stack[-1]] += seconds
+            for frame in set(stack):
+                total_seconds[frame] += seconds
+        return pd.DataFrame([
+            {'Function': self._label(frame), 'Self (s)': round(self_seconds[frame], 3), 'Total (s)': round(total_seconds[frame], 3)}
+            for frame in sorted(self_seconds, key=self_seconds.get, reverse=True)[:limit]
+        ])
+
+@contextmanager
+def profile_run():
+    """Sample the script thread while the block runs; yields the profiler, or None when profiling is off"""
+    if not profiling_enabled():
+        yield None
+        return
+    profiler = SamplingProfiler().start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+def render_profile_panel(profiler):
+    """Sidebar summary and downloads for a finished profile"""
+    if profiler is None:
+        return
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    with st.sidebar.expander("🔬 Profile", expanded=True):
+        st.caption(f"{profiler.samples:,} samples every {profiler.interval * 1000:.0f} ms over {profiler.seconds:.2f}s")
+        if not profiler.stacks:
+            st.info("No samples were taken; the run was shorter than the sampling interval.")
+            return
+        st.dataframe(profiler.top_functions(), hide_index=True, use_container_width=True)
+        st.download_button(
+            label="📥 Download speedscope profile",
+            data=profiler.speedscope(f"Hold Busters rerun {stamp}"),
+            file_name=f"hold_busters_profile_{stamp}.speedscope.json",
+            mime="application/json",
+            key="profile_speedscope_download"
+        )
+        st.download_button(
+            label="📥 Download collapsed stacks",
+            data=profiler.collapsed(),
+            file_name=f"hold_busters_profile_{stamp}.collapsed.txt",
+            mime="text/plain",
+            key="profile_collapsed_download"
+        )
+
+# Query layer
+# Every value goes through the connector's ``:name`` parameter binding, so
+# statement texts stay stable (and hit the warehouse caches) and quotes in
+# the data can't break them. Only the schema identifier is spliced in, and
+# main() validates it against SCHEMA_NAME_PATTERN first.
+SCHEMA_NAME_PATTERN = re.compile(r"^(`[^`]+`|[A-Za-z_]\w*)(\.(`[^`]+`|[A-Za-z_]\w*))?$")
+
+def execute_statement(_conn, statement, params=None, fetch=False):
+    """Run an uncached statement (writes, or reads that must be fresh)
+
+    Returns the fetched rows when ``fetch`` is set. Errors propagate to the
+    caller, which decides how to report them.
+    """
+    started = time.perf_counter()
+    cursor = _conn.cursor()
+    try:
+        cursor.execute(statement, params)
+        rows = cursor.fetchall() if fetch else None
+        record_query(started, 'uncached', rows=len(rows) if rows is not None else None)
+        return rows
+    except Exception as e:
+        record_query(started, 'uncached', error=str(e))
+        raise
+    finally:
+        cursor.close()
+
 # Query functions with caching
+@timed_query
 @st.cache_data(ttl=600)  # Cache for 10 minutes
-def query_databricks(_conn, query):
-    """Execute a query and return results as pandas DataFrame"""
+def query_databricks(_conn, query, params=None, show_errors=True):
+    """Execute a query and return results as pandas DataFrame
+
+    ``params`` is bound by the connector (``:name`` markers), so filter
+    values never have to be spliced into the SQL text. Pass
+    ``show_errors=False`` for optional tables whose absence is handled
+    by the caller.
+    """
+    started = time.perf_counter()
     try:
         cursor = _conn.cursor()
-        cursor.execute(query)
+        cursor.execute(query, params)
         # Fetch as Arrow table and convert to pandas
-        result = cursor.fetchall_arrow().to_pandas()
+        table = cursor.fetchall_arrow()
         cursor.close()
-        return result
+        record_query(started, 'miss', table)
+        return arrow_to_pandas(table)
+    except Exception as e:
+        record_query(started, 'miss', error=str(e))
+        if show_errors:
+            st.error(f"Query error: {str(e)}")
+        return pd.DataFrame()
+
+# Disk result cache for the large row-level queries. Results are Arrow IPC
+# files shared by every session, worker process and restart: the file's
+# mtime is its fetch time (TTL) and its atime its last use (LRU eviction).
+# It saves the warehouse round trip, not memory: each process still converts
+# a result into its own pandas copy, held once by a cache_resource getter.
+RESULT_CACHE_DIR = os.getenv("HOLD_BUSTERS_CACHE_DIR", ".result_cache")
+RESULT_CACHE_TTL_SECONDS = 600
+RESULT_CACHE_MAX_BYTES = int(os.getenv("HOLD_BUSTERS_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+def result_cache_path(query, params=None, schema_name="default"):
+    """Cache file for a query: ``<schema>-<hash of query text and params>.arrow``"""
+    key = query + "\n" + repr(sorted((params or {}).items()))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    schema_prefix = re.sub(r"\W+", "_", schema_name).strip("_") or "schema"
+    return os.path.join(RESULT_CACHE_DIR, f"{schema_prefix}-{digest}.arrow")
+
+def read_cached_result(path):
+    """
+    Memory-map a cache file as an Arrow table.
+
+    Returns ``(table, fresh)``; ``table`` is None if there is no usable file,
+    and an expired table is still returned so it can be refreshed
+    incrementally.
+    """
+    try:
+        stat = os.stat(path)
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        os.utime(path, (time.time(), stat.st_mtime))
+        return table, time.time() - stat.st_mtime <= RESULT_CACHE_TTL_SECONDS
+    except (OSError, pa.ArrowInvalid):
+        return None, False
+
+def write_cached_result(path, table):
+    """Write a result atomically, then evict least recently used files over the size limit"""
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        # Unique per write: sessions are threads of one process and may write the same key at once
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    except OSError:
+        return
+
+    entries = []
+    for entry in os.scandir(RESULT_CACHE_DIR):
+        if entry.name.endswith(".arrow"):
+            stat = entry.stat()
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total_bytes <= RESULT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(entry_path)
+            total_bytes -= size
+        except OSError:
+            pass  # still mapped by another process (Windows); try again next time
+
+def expire_result_cache():
+    """Mark every cached result as expired, so its next read refreshes it incrementally"""
+    if not os.path.isdir(RESULT_CACHE_DIR):
+        return
+    for entry in os.scandir(RESULT_CACHE_DIR):
+        try:
+            os.utime(entry.path, (entry.stat().st_atime, 0))
+        except OSError:
+            pass
+
+def clear_result_cache():
+    """Remove every disk-cached result, forcing full refetches"""
+    if not os.path.isdir(RESULT_CACHE_DIR):
+        return
+    for entry in os.scandir(RESULT_CACHE_DIR):
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+# Incremental refresh. A cached row-level result records its table's
+# MAX(LastModifiedDate) from just before it was fetched. Once it expires
+# only rows modified since then are fetched, and they replace the cached
+# rows with the same primary key. Upstream deletes are only picked up by a
+# full reload.
+CHANGE_COLUMN = "LastModifiedDate"
+HIGH_WATER_MARK_KEY = b"hold_busters.high_water_mark"
+
+def fetch_arrow(_conn, query, params=None):
+    """Run a query and return the result as an Arrow table (errors propagate)"""
+    cursor = _conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall_arrow()
+    finally:
+        cursor.close()
+
+def table_high_water_mark(_conn, schema_name, table_name):
+    """MAX(LastModifiedDate) of a table, or None if it can't be determined"""
+    try:
+        rows = execute_statement(_conn, f"SELECT MAX({CHANGE_COLUMN}) FROM {schema_name}.{table_name}", fetch=True)
+        return rows[0][0]
+    except Exception:
+        return None
+
+def cached_high_water_mark(table):
+    """The high-water mark stored with a cached result, if any"""
+    metadata = (table.schema.metadata or {}) if table is not None else {}
+    if HIGH_WATER_MARK_KEY not in metadata:
+        return None
+    return datetime.fromisoformat(metadata[HIGH_WATER_MARK_KEY].decode("utf-8"))
+
+def fetch_changed_rows(_conn, schema_name, delta, params, since):
+    """
+    Fetch every row modified since ``since``. Rows that don't match the
+    cached query's filter are still returned (flagged in Delta_Matches) so
+    rows that moved out of the filter are dropped from the cache too.
+    """
+    match_sql = f",\n        CASE WHEN {delta['where']} THEN 1 ELSE 0 END as Delta_Matches" if delta.get('where') else ""
+    query = f"""
+    SELECT {delta['columns']}{match_sql}
+    FROM {schema_name}.{delta['table']}
+    WHERE {CHANGE_COLUMN} >= :delta_since
+    """
+    return fetch_arrow(_conn, query, {**(params or {}), 'delta_since': since})
+
+def merge_changed_rows(cached, changed, delta):
+    """Replace cached rows by primary key with the changed rows, keeping the query's order"""
+    key = delta['primary_key']
+    fresh = changed
+    if 'Delta_Matches' in changed.column_names:
+        fresh = changed.filter(pc.equal(changed['Delta_Matches'], 1)).drop_columns(['Delta_Matches'])
+    kept = cached.filter(pc.invert(pc.is_in(cached[key], value_set=changed[key])))
+    merged = pa.concat_tables([kept, fresh.select(kept.column_names)], promote_options="permissive")
+    if delta.get('order_by'):
+        merged = merged.sort_by([(delta['order_by'], "descending")])
+    return merged
+
+def query_disk_cached(_conn, query, params=None, schema_name="default", delta=None):
+    """
+    ``query_databricks`` backed by the disk result cache.
+
+    A fresh cached result is read from its memory-mapped file instead of
+    refetched (then converted to a private pandas frame). ``delta``
+    describes how to refresh an expired one incrementally: a dict with the
+    source ``table``, its ``primary_key``, the ``columns`` SQL of ``query``,
+    and optionally the ``where`` SQL (using ``params``) and a descending
+    ``order_by`` column. Without it, or without a stored high-water mark,
+    the whole query reruns. Failed queries are reported and never cached.
+    Connections that opt out (``result_cache = False``, e.g. the local
+    backend) go straight to ``query_databricks``.
+    """
+    if not getattr(_conn, 'result_cache', True):
+        return query_databricks(_conn, query, params)
+
+    started = time.perf_counter()
+    path = result_cache_path(query, params, schema_name)
+    cached, fresh = read_cached_result(path)
+    if fresh:
+        record_query(started, 'disk', cached)
+        return arrow_to_pandas(cached)
+
+    cache = 'miss'
+    try:
+        # Taken before fetching, so rows changed during the fetch are picked up next time
+        high_water_mark = table_high_water_mark(_conn, schema_name, delta['table']) if delta else None
+        since = cached_high_water_mark(cached)
+        if since is not None and high_water_mark is not None:
+            cache = 'delta'
+            table = merge_changed_rows(cached, fetch_changed_rows(_conn, schema_name, delta, params, since), delta)
+        else:
+            table = fetch_arrow(_conn, query, params)
     except Exception as e:
+        record_query(started, cache, error=str(e))
         st.error(f"Query error: {str(e)}")
         return pd.DataFrame()
+    record_query(started, cache, table)
 
+    if high_water_mark is not None:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), HIGH_WATER_MARK_KEY: high_water_mark.isoformat()
+        })
+    write_cached_result(path, table)
+    return arrow_to_pandas(table)
+
+def build_invoice_filters(statuses=(), date_range=None):
+    """
+    Turn the sidebar filter values into a parameterized WHERE clause.
+
+    Returns a ``(where_sql, params)`` tuple for the invoices table. Empty
+    filters are left out, so the defaults select every dated invoice.
+    ``date_range`` is an inclusive ``(start_date, end_date)`` pair.
+    """
+    clauses = ["Invoice_Date__c IS NOT NULL"]
+    params = {}
+    
+    if statuses:
+        markers = []
+        for i, status in enumerate(statuses):
+            params[f"status_{i}"] = status
+            markers.append(f":status_{i}")
+        clauses.append(f"sitetracker__Status__c IN ({', '.join(markers)})")
+    
+    if date_range:
+        start_date, end_date = date_range
+        # Invoice_Date__c is a timestamp, so compare against the next day to keep the end date inclusive
+        params["start_date"] = start_date
+        params["end_date"] = end_date + timedelta(days=1)
+        clauses.append("Invoice_Date__c >= :start_date AND Invoice_Date__c < :end_date")
+    
+    return " AND ".join(clauses), params
+
+@timed_query
 @st.cache_data(ttl=600)
-def get_invoices(_conn, schema_name="default"):
-    """Fetch invoices from Databricks table"""
+def get_invoice_filter_options(_conn, schema_name="default"):
+    """Fetch the distinct statuses and their invoice date bounds for the sidebar filters"""
     query = f"""
     SELECT 
+        sitetracker__Status__c as Status,
+        MIN(Invoice_Date__c) as Min_Date,
+        MAX(Invoice_Date__c) as Max_Date
+    FROM {schema_name}.invoices
+    WHERE Invoice_Date__c IS NOT NULL
+        AND sitetracker__Status__c IS NOT NULL
+    GROUP BY sitetracker__Status__c
+    ORDER BY Status
+    """
+    return query_databricks(_conn, query)
+
+# Columns selected for row-level invoice queries
+INVOICE_COLUMNS = """
         Invoice_Id,
         Invoice_Name,
         Vendor__Name,
@@ -87,20 +752,433 @@ def get_invoices(_conn, schema_name="default"):
         Reason__c,
         State__c,
         Approval_Date__c,
-        Due_Date_Formula__c
+        Due_Date_Formula__c"""
+
+# Server-side sort options for the paged Invoice Details grid.
+# NULLs are coalesced so the keyset comparison always has a value to compare.
+INVOICE_PAGE_SORT_KEYS = {
+    'Invoice Date': "Invoice_Date__c",
+    'Amount': "COALESCE(Total_Amount__c, 0)",
+    'Days Pending': "COALESCE(Days_Pending_Approval__c, 0)",
+    'Vendor': "COALESCE(Vendor__Name, '')",
+    'Invoice Name': "COALESCE(Invoice_Name, '')"
+}
+INVOICE_PAGE_SIZES = [50, 100, 250, 500]
+
+# Compact in-memory representation of the row-level invoice frame
+INVOICE_CATEGORY_COLUMNS = ['Status', 'Vendor__Name', 'PO_Name', 'State__c', 'Integration_Status__c', 'Reason__c']
+INVOICE_DATE_COLUMNS = ['Invoice_Date__c', 'Approval_Date__c', 'Due_Date_Formula__c']
+INVOICE_DOWNCAST_COLUMNS = ['Days_Pending_Approval__c']
+ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+def compact_invoices(df):
+    """
+    Shrink the invoice frame once, right after it is loaded.
+
+    Low-cardinality text becomes categorical and other text Arrow-backed
+    strings. Dates are parsed to tz-naive datetimes and whole-number day
+    counts are downcast. Amounts stay float64 so cents remain exact.
+    """
+    if df.empty:
+        return df
+    
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in INVOICE_CATEGORY_COLUMNS:
+            values = values.astype('category')
+        elif col in INVOICE_DATE_COLUMNS:
+            values = pd.to_datetime(values, errors='coerce')
+            if values.dt.tz is not None:
+                values = values.dt.tz_localize(None)
+        elif col in INVOICE_DOWNCAST_COLUMNS:
+            values = pd.to_numeric(values, errors='coerce')
+            if values.notna().all() and (values % 1 == 0).all():
+                values = pd.to_numeric(values.astype('int64'), downcast='integer')
+        elif values.dtype == object:
+            values = values.astype(ARROW_STRING_DTYPE)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def get_invoices(_conn, schema_name="default", statuses=(), date_range=None):
+    """
+    Fetch the invoices matching the sidebar filters from Databricks table
+    (uncached in memory; get_invoice_windows holds the shared copies)
+    """
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    query = f"""
+    SELECT {INVOICE_COLUMNS}
     FROM {schema_name}.invoices
-    WHERE Invoice_Date__c IS NOT NULL
+    WHERE {where_sql}
     ORDER BY Invoice_Date__c DESC
     """
-    return query_databricks(_conn, query)
+    delta = {'table': 'invoices', 'primary_key': 'Invoice_Id', 'columns': INVOICE_COLUMNS,
+             'where': where_sql, 'order_by': 'Invoice_Date__c'}
+    return compact_invoices(query_disk_cached(_conn, query, params, schema_name, delta))
+
+# Sidebar filtering of the row-level invoices
+INVOICE_WINDOW_CACHE_ENTRIES = 4
+INVOICE_VIEW_CACHE_ENTRIES = 8
+INVOICE_MASK_CACHE_ENTRIES = 32
+
+def memoize(cache, key, compute, max_entries, lock):
+    """
+    Look ``key`` up in an OrderedDict used as an LRU cache, computing it on a
+    miss. The dicts are shared by every session, so ``lock`` guards each
+    access; the value is computed outside it, so a slow miss doesn't block
+    other sessions' lookups.
+    """
+    with lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    value = compute()
+    with lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+    return value
+
+def window_covers(window, statuses=(), date_range=None):
+    """True if the invoices loaded for ``window`` (a ``(statuses, date_range)`` pair) include every match for these filters"""
+    window_statuses, window_dates = window
+    if window_statuses and not (statuses and set(statuses) <= set(window_statuses)):
+        return False
+    if window_dates and not (date_range and window_dates[0] <= date_range[0] and date_range[1] <= window_dates[1]):
+        return False
+    return True
 
+class InvoiceView:
+    """
+    The invoices loaded for one filter window, with memoized refinements.
+    
+    Each filter's boolean mask is cached on that filter's value alone, and
+    the combined view on the full filter state, so changing one widget
+    recomputes only its own mask plus one ``&``. A filter equal to the
+    window's own needs no mask. One search index covers the whole window
+    and its matches are intersected with the same masks. The frame and its
+    views are shared by every session: treat them as read-only and derive
+    new columns with ``assign``.
+    """
+    
+    def __init__(self, df, statuses=(), date_range=None):
+        self.df = df
+        self.window = (statuses, date_range)
+        self._lock = threading.Lock()
+        self._status_masks = OrderedDict()
+        self._date_masks = OrderedDict()
+        self._views = OrderedDict()
+        self._search_index = None
+    
+    def status_mask(self, statuses):
+        """Rows whose Status is in ``statuses`` (None when the window already matches)"""
+        if not statuses or statuses == self.window[0] or self.df.empty:
+            return None
+        return memoize(self._status_masks, statuses, lambda: self._isin('Status', statuses), INVOICE_MASK_CACHE_ENTRIES, self._lock)
+    
+    def date_mask(self, date_range):
+        """Rows dated within the inclusive ``(start_date, end_date)`` (None when the window already matches)"""
+        if not date_range or date_range == self.window[1] or self.df.empty:
+            return None
+        
+        def compute():
+            start_date, end_date = date_range
+            dates = self.df['Invoice_Date__c']
+            # Same bounds as build_invoice_filters: the end date is inclusive
+            return ((dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date + timedelta(days=1)))).to_numpy()
+        
+        return memoize(self._date_masks, date_range, compute, INVOICE_MASK_CACHE_ENTRIES, self._lock)
+    
+    def filtered(self, statuses=(), date_range=None):
+        """The invoices matching the sidebar filters (which must lie within the window)"""
+        def compute():
+            masks = [mask for mask in (self.status_mask(statuses), self.date_mask(date_range)) if mask is not None]
+            if not masks:
+                return self.df
+            return self.df[np.logical_and.reduce(masks)]
+        
+        return memoize(self._views, (statuses, date_range), compute, INVOICE_VIEW_CACHE_ENTRIES, self._lock)
+    
+    def search_index(self):
+        """The search index over the whole window, built on first use"""
+        if self._search_index is None:
+            search_index = InvoiceSearchIndex(self.df)
+            with self._lock:
+                if self._search_index is None:
+                    self._search_index = search_index
+        return self._search_index
+    
+    def search(self, query, mode="Contains", statuses=(), date_range=None):
+        """The invoices matching ``query`` and the sidebar filters: the window's index intersected with its masks"""
+        matched = np.zeros(len(self.df), dtype=bool)
+        matched[self.search_index().search(query, mode)] = True
+        masks = [mask for mask in (self.status_mask(statuses), self.date_mask(date_range)) if mask is not None]
+        return self.df[np.logical_and.reduce([matched] + masks)]
+    
+    def _isin(self, col, values):
+        column = self.df[col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Compare the few categories, then select rows by code
+            wanted = np.flatnonzero(column.cat.categories.isin(values))
+            return np.isin(column.cat.codes.to_numpy(), wanted)
+        return column.isin(values).to_numpy()
+
+class InvoiceWindows:
+    """
+    The row-level invoices loaded for one schema, shared by every session.
+    
+    The sidebar filters are pushed down to the warehouse, so a session only
+    downloads the invoices it selects. Filters that fall inside an already
+    loaded window (fewer statuses, a narrower date range) are answered from
+    that window's masks instead of a new query.
+    """
+    
+    def __init__(self, conn, schema_name="default"):
+        self._conn = conn
+        self.schema_name = schema_name
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+    
+    def view(self, statuses=(), date_range=None):
+        """The smallest loaded window covering these filters, loading one if none does"""
+        with self._lock:
+            covering = [window for window in self._windows if window_covers(window, statuses, date_range)]
+            if covering:
+                window = min(covering, key=lambda window: len(self._windows[window].df))
+                self._windows.move_to_end(window)
+                return self._windows[window]
+        
+        view = InvoiceView(get_invoices(self._conn, self.schema_name, statuses, date_range), statuses, date_range)
+        with self._lock:
+            self._windows[view.window] = view
+            while len(self._windows) > INVOICE_WINDOW_CACHE_ENTRIES:
+                self._windows.popitem(last=False)
+        return view
+    
+    def filtered(self, statuses=(), date_range=None):
+        """The invoices matching the sidebar filters"""
+        return self.view(statuses, date_range).filtered(statuses, date_range)
+    
+    def search(self, query, mode="Contains", statuses=(), date_range=None):
+        """The invoices matching ``query`` and the sidebar filters"""
+        return self.view(statuses, date_range).search(query, mode, statuses, date_range)
+
+@st.cache_resource(ttl=600)
+def get_invoice_windows(_conn, schema_name="default"):
+    """Share the schema's loaded invoice windows (with their filter memos) across sessions"""
+    return InvoiceWindows(_conn, schema_name)
+
+@timed_query
 @st.cache_data(ttl=600)
-def get_invoice_lines(_conn, schema_name="default"):
-    """Fetch invoice lines from Databricks table"""
+def get_invoice_page(_conn, schema_name="default", statuses=(), date_range=None,
+                     sort_by="Invoice Date", descending=True, page_size=100, after=None):
+    """
+    Fetch one page of invoices using keyset pagination.
+    
+    Rows are ordered by the chosen sort key with Invoice_Id as tie-breaker.
+    ``after`` is the ``(Sort_Key, Invoice_Id)`` of the last row on the previous
+    page, so the warehouse seeks straight to the next page instead of
+    scanning past an OFFSET.
+    """
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    sort_expr = INVOICE_PAGE_SORT_KEYS[sort_by]
+    direction = "DESC" if descending else "ASC"
+    
+    if after is not None:
+        op = "<" if descending else ">"
+        params["after_key"], params["after_id"] = after
+        where_sql += (
+            f" AND ({sort_expr} {op} :after_key"
+            f" OR ({sort_expr} = :after_key AND Invoice_Id {op} :after_id))"
+        )
+    
+    query = f"""
+    SELECT {INVOICE_COLUMNS},
+        {sort_expr} as Sort_Key
+    FROM {schema_name}.invoices
+    WHERE {where_sql}
+    ORDER BY {sort_expr} {direction}, Invoice_Id {direction}
+    LIMIT {int(page_size)}
+    """
+    return query_databricks(_conn, query, params)
+
+def page_cursor(page_df):
+    """Return the keyset cursor (Sort_Key, Invoice_Id) for the last row of a page"""
+    last_row = page_df.iloc[-1]
+    sort_key = last_row['Sort_Key']
+    # Hand the connector plain Python values rather than pandas/numpy scalars
+    if isinstance(sort_key, pd.Timestamp):
+        sort_key = sort_key.to_pydatetime()
+    elif hasattr(sort_key, 'item'):
+        sort_key = sort_key.item()
+    return (sort_key, str(last_row['Invoice_Id']))
+
+# Aggregation queries - the warehouse does the GROUP BY and returns a few dozen rows
+@timed_query
+@st.cache_data(ttl=600)
+def get_invoice_kpis(_conn, schema_name="default", statuses=(), date_range=None):
+    """Fetch the KPI row (invoice count, on-hold count, total amount, avg days pending) as one row"""
+    where_sql, params = build_invoice_filters(statuses, date_range)
     query = f"""
     SELECT 
+        COUNT(*) as Total_Invoices,
+        COALESCE(SUM(CASE WHEN sitetracker__Status__c = 'Hold' THEN 1 ELSE 0 END), 0) as On_Hold,
+        COALESCE(SUM(Total_Amount__c), 0) as Total_Amount,
+        AVG(Days_Pending_Approval__c) as Avg_Days_Pending
+    FROM {schema_name}.invoices
+    WHERE {where_sql}
+    """
+    return query_databricks(_conn, query, params)
+
+@timed_query
+@st.cache_data(ttl=600)
+def get_status_counts(_conn, schema_name="default", statuses=(), date_range=None):
+    """Fetch invoice counts per status"""
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    query = f"""
+    SELECT 
+        sitetracker__Status__c as Status,
+        COUNT(*) as Invoice_Count
+    FROM {schema_name}.invoices
+    WHERE {where_sql}
+    GROUP BY sitetracker__Status__c
+    ORDER BY Invoice_Count DESC
+    """
+    return query_databricks(_conn, query, params)
+
+@timed_query
+@st.cache_data(ttl=600)
+def get_top_vendors(_conn, schema_name="default", statuses=(), date_range=None, limit=10):
+    """Fetch the vendors with the highest total invoice amount"""
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    query = f"""
+    SELECT 
+        Vendor__Name,
+        SUM(Total_Amount__c) as Total_Amount
+    FROM {schema_name}.invoices
+    WHERE {where_sql}
+    GROUP BY Vendor__Name
+    ORDER BY Total_Amount DESC
+    LIMIT {int(limit)}
+    """
+    return query_databricks(_conn, query, params)
+
+@timed_query
+@st.cache_data(ttl=600)
+def get_monthly_amounts(_conn, schema_name="default", statuses=(), date_range=None):
+    """Fetch the total invoice amount per calendar month"""
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    query = f"""
+    SELECT 
+        DATE_TRUNC('MONTH', Invoice_Date__c) as Invoice_Date__c,
+        SUM(Total_Amount__c) as Total_Amount__c
+    FROM {schema_name}.invoices
+    WHERE {where_sql}
+    GROUP BY DATE_TRUNC('MONTH', Invoice_Date__c)
+    ORDER BY Invoice_Date__c
+    """
+    return query_databricks(_conn, query, params)
+
+# Error patterns, pre-bucketed by error_patterns.py into Invoice_Error_Patterns
+ERROR_PATTERN_JOIN = f"""
+    FROM {{schema_name}}.invoices i
+    LEFT JOIN {{schema_name}}.{PATTERNS_TABLE} p ON i.Invoice_Id = p.Invoice_Id"""
+
+ERROR_PATTERN_COLUMNS = """
+        CASE
+            WHEN p.Pattern_Id IS NOT NULL THEN p.Pattern_Id
+            WHEN i.Integration_Error_Message__c IS NULL THEN :no_error_id
+            ELSE :unclassified_id
+        END as Pattern_Id"""
+
+def build_error_pattern_filters(statuses=(), date_range=None):
+    """Filters for the on-hold invoices in the current sidebar selection, plus the fallback pattern IDs"""
+    where_sql, params = build_invoice_filters(statuses, date_range)
+    params.update({
+        'no_error_id': NO_ERROR_PATTERN_ID,
+        'unclassified_id': UNCLASSIFIED_PATTERN_ID
+    })
+    return f"{where_sql} AND sitetracker__Status__c = 'Hold'", params
+
+@timed_query
+@st.cache_data(ttl=600)
+def get_error_pattern_summary(_conn, schema_name="default", statuses=(), date_range=None):
+    """Fetch invoice count, amount and avg days pending per error pattern for invoices on hold"""
+    where_sql, params = build_error_pattern_filters(statuses, date_range)
+    params.update({
+        'no_error_pattern': NO_ERROR_PATTERN,
+        'unclassified_pattern': UNCLASSIFIED_PATTERN
+    })
+    query = f"""
+    SELECT {ERROR_PATTERN_COLUMNS},
+        CASE
+            WHEN p.Pattern_Id IS NOT NULL THEN p.Error_Pattern
+            WHEN i.Integration_Error_Message__c IS NULL THEN :no_error_pattern
+            ELSE :unclassified_pattern
+        END as Error_Pattern,
+        COUNT(*) as Invoice_Count,
+        SUM(i.Total_Amount__c) as Total_Amount,
+        AVG(i.Days_Pending_Approval__c) as Avg_Days_Pending
+    {ERROR_PATTERN_JOIN.format(schema_name=schema_name)}
+    WHERE {where_sql}
+    GROUP BY 1, 2
+    ORDER BY Invoice_Count DESC
+    """
+    return query_databricks(_conn, query, params, show_errors=False)
+
+@timed_query
+@st.cache_data(ttl=600)
+def get_error_pattern_assignments(_conn, schema_name="default", statuses=(), date_range=None):
+    """Fetch the error pattern of every invoice on hold"""
+    where_sql, params = build_error_pattern_filters(statuses, date_range)
+    query = f"""
+    SELECT i.Invoice_Id, {ERROR_PATTERN_COLUMNS}
+    {ERROR_PATTERN_JOIN.format(schema_name=schema_name)}
+    WHERE {where_sql}
+    """
+    return query_databricks(_conn, query, params, show_errors=False)
+
+def get_error_groups(conn, schema_name, statuses, date_range, hold_invoices):
+    """
+    Bucket the invoices on hold by canonical error pattern.
+    
+    Reads pre-bucketed counts from Invoice_Error_Patterns when the table
+    exists; otherwise classifies the messages in-app (once per distinct
+    message). Returns the per-pattern summary and ``hold_invoices`` with a
+    ``Pattern_Id`` column.
+    """
+    summary = get_error_pattern_summary(conn, schema_name, statuses, date_range)
+    
+    if not summary.empty:
+        assignments = get_error_pattern_assignments(conn, schema_name, statuses, date_range)
+        hold_invoices = hold_invoices.merge(assignments, on='Invoice_Id', how='left')
+        hold_invoices['Pattern_Id'] = hold_invoices['Pattern_Id'].fillna(UNCLASSIFIED_PATTERN_ID)
+    else:
+        patterns = classify_error_messages(hold_invoices['Integration_Error_Message__c'])
+        hold_invoices = hold_invoices.assign(Pattern_Id=patterns['Pattern_Id'])
+        summary = pd.concat([hold_invoices, patterns[['Error_Pattern']]], axis=1).groupby(
+            ['Pattern_Id', 'Error_Pattern']
+        ).agg(
+            Invoice_Count=('Invoice_Id', 'count'),
+            Total_Amount=('Total_Amount__c', 'sum'),
+            Avg_Days_Pending=('Days_Pending_Approval__c', 'mean')
+        ).reset_index()
+    
+    error_groups = summary.rename(columns={
+        'Pattern_Id': 'Pattern Id',
+        'Error_Pattern': 'Error Pattern',
+        'Invoice_Count': 'Invoice Count',
+        'Total_Amount': 'Total Amount',
+        'Avg_Days_Pending': 'Avg Days Pending'
+    }).sort_values('Invoice Count', ascending=False)
+    return error_groups, hold_invoices
+
+# Columns selected for invoice line and integration response queries
+INVOICE_LINE_COLUMNS = """
         Invoice_Line_Id,
         Invoice_Id,
+        Invoice_Line_Number__c,
         Project_Id,
         Invoice_Amount__c,
         Invoice_Status__c,
@@ -108,92 +1186,537 @@ def get_invoice_lines(_conn, schema_name="default"):
         Company_Code__c,
         Cost_Category_Name__c,
         sitetracker__Quantity__c,
-        sitetracker__Unit_Price__c
+        sitetracker__Unit_Price__c"""
+
+INTEGRATION_RESPONSE_COLUMNS = """
+        Intg_Resp_Id,
+        Invoice_Id,
+        Infinium_Request__c,
+        Infinium_Response__c,
+        Error_Message__c,
+        Operation__c"""
+
+PROJECT_COLUMNS = """
+        Project_Id,
+        Infinium_Project_Number__c,
+        Company__c,
+        Infinium_Status__c,
+        Approval_Status__c"""
+
+# Point lookups keep their own small LRU cache instead of the full tables
+POINT_LOOKUP_CACHE_ENTRIES = 256
+
+def get_invoice_lines(_conn, schema_name="default"):
+    """Fetch invoice lines from Databricks table (uncached in memory; get_invoice_lines_index holds the copy)"""
+    query = f"""
+    SELECT {INVOICE_LINE_COLUMNS}
     FROM {schema_name}.invoice_lines
     """
-    return query_databricks(_conn, query)
+    delta = {'table': 'invoice_lines', 'primary_key': 'Invoice_Line_Id', 'columns': INVOICE_LINE_COLUMNS}
+    return query_disk_cached(_conn, query, schema_name=schema_name, delta=delta)
 
+@timed_query
 @st.cache_data(ttl=600)
 def get_projects(_conn, schema_name="default"):
     """Fetch projects from Databricks table"""
     query = f"""
-    SELECT 
-        Project_Id,
-        Infinium_Project_Number__c,
-        Company__c,
-        Infinium_Status__c,
-        Approval_Status__c
+    SELECT {PROJECT_COLUMNS}
     FROM {schema_name}.projects
     """
-    return query_databricks(_conn, query)
+    return query_disk_cached(_conn, query, schema_name=schema_name)
 
-@st.cache_data(ttl=600)
 def get_integration_responses(_conn, schema_name="default"):
-    """Fetch integration responses from Databricks table"""
+    """Fetch integration responses from Databricks table (uncached in memory; get_integration_responses_index holds the copy)"""
     query = f"""
-    SELECT 
-        Invoice_Id,
-        Infinium_Request__c,
-        Infinium_Response__c,
-        Error_Message__c,
-        Operation__c
+    SELECT {INTEGRATION_RESPONSE_COLUMNS}
     FROM {schema_name}.Integration_Responses
     """
-    return query_databricks(_conn, query)
+    delta = {'table': 'Integration_Responses', 'primary_key': 'Intg_Resp_Id', 'columns': INTEGRATION_RESPONSE_COLUMNS}
+    return query_disk_cached(_conn, query, schema_name=schema_name, delta=delta)
+
+# PO ledger for the "Send to Linus" calculations
+PAID_STATUSES = ['Paid', 'Committed']
+PENDING_STATUSES = ['Draft', 'Submitted', 'Approved', 'Hold']
+EXPECTED_ADDITIONAL_RATE = 0.10
 
+def status_markers(prefix, statuses, params):
+    """Add one bound parameter per status and return the ``IN (...)`` marker list"""
+    markers = []
+    for i, status in enumerate(statuses):
+        params[f"{prefix}_{i}"] = status
+        markers.append(f":{prefix}_{i}")
+    return ", ".join(markers)
+
+@timed_query
 @st.cache_data(ttl=600)
-def get_purchase_orders(_conn, schema_name="default"):
-    """Fetch purchase orders from Databricks table"""
+def get_po_ledger(_conn, schema_name="default"):
+    """
+    Fetch the Send to Linus balance figures for every PO at once.
+    
+    One GROUP BY pass over invoices x status (all dated invoices, regardless
+    of the sidebar filters) joined to Purchase_Orders. The derived balances
+    are computed column-wise, and the result is indexed by PO_Name.
+    """
+    params = {}
+    paid_markers = status_markers("paid", PAID_STATUSES, params)
+    pending_markers = status_markers("pending", PENDING_STATUSES, params)
     query = f"""
     SELECT 
-        PO_Name,
-        PO_Amount,
-        Vendor__Name,
-        PO_Status__c
-    FROM {schema_name}.Purchase_Orders
+        po.PO_Name,
+        po.Vendor__Name,
+        po.PO_Amount as Total_Approved_PO,
+        COALESCE(inv.Invoice_Count, 0) as Invoice_Count,
+        COALESCE(inv.Hold_Count, 0) as Hold_Count,
+        COALESCE(inv.Invoiced_Year_To_Date, 0) as Invoiced_Year_To_Date,
+        COALESCE(inv.Paid_Committed, 0) as Paid_Committed,
+        COALESCE(inv.Total_Pending, 0) as Total_Pending
+    FROM (
+        SELECT PO_Name, MAX(PO_Amount) as PO_Amount, MAX(Vendor__Name) as Vendor__Name
+        FROM {schema_name}.Purchase_Orders
+        GROUP BY PO_Name
+    ) po
+    LEFT JOIN (
+        SELECT 
+            PO_Name,
+            COUNT(*) as Invoice_Count,
+            SUM(CASE WHEN sitetracker__Status__c = 'Hold' THEN 1 ELSE 0 END) as Hold_Count,
+            SUM(Total_Amount__c) as Invoiced_Year_To_Date,
+            SUM(CASE WHEN sitetracker__Status__c IN ({paid_markers}) THEN Total_Amount__c ELSE 0 END) as Paid_Committed,
+            SUM(CASE WHEN sitetracker__Status__c IN ({pending_markers}) THEN Total_Amount__c ELSE 0 END) as Total_Pending
+        FROM {schema_name}.invoices
+        WHERE Invoice_Date__c IS NOT NULL
+        GROUP BY PO_Name
+    ) inv ON po.PO_Name = inv.PO_Name
     """
-    return query_databricks(_conn, query)
+    ledger = query_databricks(_conn, query, params)
+    if ledger.empty:
+        return ledger
+    
+    ledger['Remaining_Balance'] = ledger['Total_Approved_PO'] - ledger['Paid_Committed']
+    ledger['Expected_Additional'] = ledger['Total_Pending'] * EXPECTED_ADDITIONAL_RATE
+    ledger['Supplemental_Amount'] = (ledger['Total_Pending'] + ledger['Expected_Additional']) - ledger['Remaining_Balance']
+    return ledger.set_index('PO_Name', drop=False)
+
+def months_left_in_year(today=None):
+    """Remaining months in the current year (days until Dec 31 / 30, 1 decimal)"""
+    today = today or datetime.now()
+    end_of_year = datetime(today.year, 12, 31)
+    return round((end_of_year - today).days / 30.0, 1)
+
+# Invoice search index
+SEARCH_COLUMNS = ['Invoice_Name', 'Vendor__Name', 'Invoice_Id', 'PO_Name']
+SEARCH_MODES = ["Contains", "Prefix", "Fuzzy"]
+SEARCH_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SEARCH_MAX_INDEXED_BYTES = 64  # longer values are always re-checked instead of indexed in full
+SEARCH_FUZZY_CANDIDATES = 2000
+
+def _within_edit_distance(a, b, max_distance):
+    """Levenshtein distance check that gives up once every path exceeds ``max_distance``"""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+class TrigramIndex:
+    """
+    Byte-trigram posting lists over a list of strings, built with NumPy.
+    
+    Postings are stored CSR-style: ``self._ids[self._starts[k]:self._starts[k + 1]]``
+    are the (sorted) positions of the strings containing trigram ``self._grams[k]``.
+    """
+    
+    def __init__(self, values):
+        self.size = len(values)
+        encoded = [value.encode('utf-8') for value in values]
+        self._long_ids = np.array(
+            [i for i, raw in enumerate(encoded) if len(raw) > SEARCH_MAX_INDEXED_BYTES], dtype=np.int64
+        )
+        matrix = np.array([raw[:SEARCH_MAX_INDEXED_BYTES] for raw in encoded], dtype=bytes)
+        width = matrix.dtype.itemsize if self.size else 0
+        
+        if width < 3:
+            self._grams = np.array([], dtype=np.int64)
+            self._starts = np.array([0], dtype=np.int64)
+            self._ids = np.array([], dtype=np.int64)
+            return
+        
+        chars = np.frombuffer(matrix.tobytes(), dtype=np.uint8).reshape(self.size, width).astype(np.int64)
+        codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+        # Values are NUL-padded on the right, so a non-zero third byte marks a real trigram
+        ids, positions = np.nonzero(chars[:, 2:])
+        keys = np.sort((codes[ids, positions] << 32) | ids)
+        if len(keys):
+            keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+        grams = keys >> 32
+        self._ids = keys & 0xFFFFFFFF
+        first = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]])
+        self._grams = grams[first]
+        self._starts = np.append(first, len(keys))
+    
+    @staticmethod
+    def grams_of(text):
+        raw = text.encode('utf-8')
+        return {(raw[i] << 16) | (raw[i + 1] << 8) | raw[i + 2] for i in range(len(raw) - 2)}
+    
+    def postings(self, gram):
+        k = np.searchsorted(self._grams, gram)
+        if k < len(self._grams) and self._grams[k] == gram:
+            return self._ids[self._starts[k]:self._starts[k + 1]]
+        return np.array([], dtype=np.int64)
+    
+    def candidates(self, text):
+        """Positions that may contain ``text`` as a substring (None means every position)"""
+        grams = self.grams_of(text)
+        if not grams:
+            return None
+        postings = sorted((self.postings(gram) for gram in grams), key=len)
+        result = postings[0]
+        for ids in postings[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return np.union1d(result, self._long_ids)
+    
+    def overlap(self, text):
+        """Positions sharing at least one trigram with ``text`` and how many they share"""
+        postings = [self.postings(gram) for gram in self.grams_of(text)]
+        if not postings:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(postings), return_counts=True)
+
+def lowered_codes(column):
+    """Factorize a column's lower-cased text ('' for missing) into ``(codes, uniques)``"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Already factorized: lower-case the categories, not every row
+        labels = pd.Series(column.cat.categories.astype(str), dtype=object).str.lower()
+        label_codes, uniques = pd.factorize(pd.concat([labels, pd.Series([''])], ignore_index=True))
+        # Missing values have category code -1, which picks the trailing ''
+        return label_codes[column.cat.codes.to_numpy()], uniques
+    return pd.factorize(column.fillna('').astype(str).str.lower())
+
+class InvoiceSearchIndex:
+    """
+    Search index over the invoice name, vendor, ID and PO columns.
+    
+    Built once per data load. Each column is factorized so repeated values
+    (vendors, POs) are indexed once; a query finds the matching distinct
+    values through trigram postings and maps them back to rows with a
+    vectorized ``isin``. Prefix and fuzzy modes work on the token
+    vocabulary (``SYN_PO_8`` -> ``syn``, ``po``, ``8``). Only cell values
+    are indexed, never column headers.
+    """
+    
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        self.invoice_ids = df['Invoice_Id'].to_numpy()
+        self._row_count = len(df)
+        self._columns = []
+        token_frames = []
+        
+        for col in [col for col in columns if col in df.columns]:
+            codes, uniques = lowered_codes(df[col])
+            values = pd.Series(uniques, dtype=object)
+            self._columns.append((codes, values, TrigramIndex(values.tolist())))
+            tokens = values.str.findall(SEARCH_TOKEN_PATTERN).explode().dropna()
+            token_frames.append(pd.DataFrame({
+                'token': tokens.to_numpy(dtype=object),
+                'column': len(self._columns) - 1,
+                'value': tokens.index.to_numpy()
+            }))
+        
+        tokens_df = (
+            pd.concat(token_frames, ignore_index=True).drop_duplicates().sort_values('token', kind='stable')
+            if token_frames else pd.DataFrame({'token': [], 'column': [], 'value': []})
+        )
+        vocabulary, first = np.unique(tokens_df['token'].to_numpy(dtype=object), return_index=True)
+        self._vocabulary = vocabulary.tolist()
+        self._vocabulary_lengths = np.array([len(token) for token in self._vocabulary], dtype=np.int64)
+        self._token_starts = np.append(first, len(tokens_df))
+        self._token_columns = tokens_df['column'].to_numpy(dtype=np.int64)
+        self._token_values = tokens_df['value'].to_numpy(dtype=np.int64)
+        # Tokens are padded so one- and two-character tokens still get trigrams
+        self._vocabulary_grams = TrigramIndex([f" {token} " for token in self._vocabulary])
+    
+    def search(self, query, mode="Contains"):
+        """Return the sorted row positions matching ``query``"""
+        query = query.strip().lower()
+        if not query:
+            return np.arange(self._row_count)
+        if mode == "Prefix":
+            return np.flatnonzero(self._match_tokens(query, self._prefix_tokens))
+        if mode == "Fuzzy":
+            return np.flatnonzero(self._match_tokens(query, self._fuzzy_tokens))
+        return np.flatnonzero(self._contains_mask(query))
+    
+    def _contains_mask(self, query):
+        mask = np.zeros(self._row_count, dtype=bool)
+        for codes, values, trigrams in self._columns:
+            candidates = trigrams.candidates(query)
+            checked = values if candidates is None else values.iloc[candidates]
+            # Trigrams can co-occur without being adjacent, so confirm the substring
+            matched = checked.index[checked.str.contains(query, regex=False)]
+            mask |= np.isin(codes, matched)
+        return mask
+    
+    def _match_tokens(self, query, tokens_for):
+        """AND together the rows matched by each query token"""
+        mask = None
+        for token in SEARCH_TOKEN_PATTERN.findall(query):
+            token_mask = self._rows_for_tokens(tokens_for(token))
+            mask = token_mask if mask is None else mask & token_mask
+        return mask if mask is not None else np.zeros(self._row_count, dtype=bool)
+    
+    def _rows_for_tokens(self, token_ids):
+        mask = np.zeros(self._row_count, dtype=bool)
+        if len(token_ids) == 0:
+            return mask
+        entries = np.concatenate([
+            np.arange(self._token_starts[t], self._token_starts[t + 1]) for t in token_ids
+        ])
+        for col, (codes, _, _) in enumerate(self._columns):
+            values = self._token_values[entries[self._token_columns[entries] == col]]
+            if len(values):
+                mask |= np.isin(codes, values)
+        return mask
+    
+    def _prefix_tokens(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return np.arange(start, end)
+    
+    def _fuzzy_tokens(self, token):
+        max_distance = 1 if len(token) <= 5 else 2
+        # q-gram lemma: each edit destroys at most three trigrams
+        min_shared = len(TrigramIndex.grams_of(f" {token} ")) - 3 * max_distance
+        if min_shared <= 0:
+            # Short tokens can lose every trigram to one edit, so check every token of similar length
+            candidates = np.flatnonzero(np.abs(self._vocabulary_lengths - len(token)) <= max_distance)
+        else:
+            candidates, shared = self._vocabulary_grams.overlap(f" {token} ")
+            keep = shared >= min_shared
+            candidates, shared = candidates[keep], shared[keep]
+            candidates = candidates[np.argsort(-shared, kind='stable')[:SEARCH_FUZZY_CANDIDATES]]
+        matches = [
+            t for t in candidates
+            if _within_edit_distance(token, self._vocabulary[t], max_distance)
+        ]
+        return np.union1d(np.array(matches, dtype=np.int64), self._prefix_tokens(token))
+
+@timed_query
+@st.cache_data(ttl=600, max_entries=POINT_LOOKUP_CACHE_ENTRIES)
+def get_invoice_lines_for_invoice(_conn, invoice_id, schema_name="default"):
+    """Fetch the lines of a single invoice"""
+    query = f"""
+    SELECT {INVOICE_LINE_COLUMNS}
+    FROM {schema_name}.invoice_lines
+    WHERE Invoice_Id = :invoice_id
+    ORDER BY Invoice_Line_Number__c
+    """
+    return query_databricks(_conn, query, {'invoice_id': invoice_id})
+
+@timed_query
+@st.cache_data(ttl=600, max_entries=POINT_LOOKUP_CACHE_ENTRIES)
+def get_integration_responses_for_invoice(_conn, invoice_id, schema_name="default"):
+    """Fetch the integration responses of a single invoice"""
+    query = f"""
+    SELECT {INTEGRATION_RESPONSE_COLUMNS}
+    FROM {schema_name}.Integration_Responses
+    WHERE Invoice_Id = :invoice_id
+    """
+    return query_databricks(_conn, query, {'invoice_id': invoice_id})
+
+# Invoice_Id lookups for the drill-down
+class InvoiceIdIndex:
+    """
+    Maps each Invoice_Id to the block of rows belonging to that invoice.
+    
+    The frame is sorted once by Invoice_Id (then ``order_by``) so every
+    invoice's rows are contiguous; a lookup is a dict hit plus an ``iloc``
+    slice, with no per-click scan, sort or copy.
+    """
+    
+    def __init__(self, df, order_by=()):
+        sort_cols = ['Invoice_Id'] + [col for col in order_by if col in df.columns]
+        self.df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True) if not df.empty else df
+        self._slices = {}
+        
+        if not df.empty:
+            ids = self.df['Invoice_Id'].to_numpy()
+            boundaries = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(ids)]))
+            self._slices = dict(zip(ids[starts], zip(starts.tolist(), ends.tolist())))
+    
+    @property
+    def empty(self):
+        return self.df.empty
+    
+    def get(self, invoice_id):
+        """Return the rows for ``invoice_id`` (an empty frame if there are none)"""
+        start, end = self._slices.get(invoice_id, (0, 0))
+        return self.df.iloc[start:end]
+
+@timed_query
+@st.cache_resource(ttl=600)
+def get_invoice_lines_index(_conn, schema_name="default"):
+    """Load invoice lines once and index them by Invoice_Id"""
+    return InvoiceIdIndex(get_invoice_lines(_conn, schema_name), order_by=['Invoice_Line_Number__c'])
+
+@timed_query
+@st.cache_resource(ttl=600)
+def get_integration_responses_index(_conn, schema_name="default"):
+    """Load integration responses once and index them by Invoice_Id"""
+    return InvoiceIdIndex(get_integration_responses(_conn, schema_name))
+
+class InvoicePointLookup:
+    """
+    Same interface as InvoiceIdIndex, but each lookup runs a
+    ``WHERE Invoice_Id = :invoice_id`` query, so only invoices someone
+    actually opens are ever fetched.
+    """
+    
+    empty = False
+    
+    def __init__(self, fetch, conn, schema_name="default"):
+        self._fetch = fetch
+        self._conn = conn
+        self._schema_name = schema_name
+    
+    def get(self, invoice_id):
+        return self._fetch(self._conn, invoice_id, self._schema_name)
+
+# Linus requests
+LINUS_REQUEST_FIELDS = [
+    'Request_Id', 'Invoice_Id', 'Invoice_Name', 'PO_Name', 'Vendor_Name',
+    'Invoice_Amount', 'Months_Into_Year', 'Total_Approved_PO',
+    'Invoiced_Year_To_Date', 'Remaining_Balance', 'Total_Pending',
+    'Expected_Additional', 'Supplemental_Amount'
+]
+
+def linus_request_params(request, suffix=""):
+    """Bind one Linus request's fields; returns its ``:name`` markers and params"""
+    markers = []
+    params = {}
+    for field in LINUS_REQUEST_FIELDS:
+        value = request[field]
+        if pd.isna(value):
+            value = None
+        elif isinstance(value, (int, float, np.number)):
+            value = float(value)
+        params[f"{field}{suffix}"] = value
+        markers.append(f":{field}{suffix}")
+    return markers, params
 
 def insert_linus_request(_conn, request_data, schema_name="default"):
     """Insert a Linus request into the database"""
     try:
-        cursor = _conn.cursor()
-        
-        insert_query = f"""
+        markers, params = linus_request_params(request_data)
+        execute_statement(_conn, f"""
         INSERT INTO {schema_name}.Linus_Requests (
-            Request_Id, Invoice_Id, Invoice_Name, PO_Name, Vendor_Name,
-            Invoice_Amount, Months_Into_Year, Total_Approved_PO, 
-            Invoiced_Year_To_Date, Remaining_Balance, Total_Pending,
-            Expected_Additional, Supplemental_Amount, Request_Date, 
-            Created_By, Status, LastModifiedDate
+            {', '.join(LINUS_REQUEST_FIELDS)},
+            Request_Date, Created_By, Status, LastModifiedDate
         ) VALUES (
-            '{request_data['Request_Id']}',
-            '{request_data['Invoice_Id']}',
-            '{request_data['Invoice_Name']}',
-            '{request_data['PO_Name']}',
-            '{request_data['Vendor_Name']}',
-            {request_data['Invoice_Amount']},
-            {request_data['Months_Into_Year']},
-            {request_data['Total_Approved_PO']},
-            {request_data['Invoiced_Year_To_Date']},
-            {request_data['Remaining_Balance']},
-            {request_data['Total_Pending']},
-            {request_data['Expected_Additional']},
-            {request_data['Supplemental_Amount']},
-            CURRENT_TIMESTAMP(),
-            'Streamlit App',
-            'Pending',
-            CURRENT_TIMESTAMP()
+            {', '.join(markers)},
+            CURRENT_TIMESTAMP, 'Streamlit App', 'Pending', CURRENT_TIMESTAMP
         )
-        """
-        
-        cursor.execute(insert_query)
-        cursor.close()
+        """, params)
         return True
     except Exception as e:
         st.error(f"Error inserting request: {str(e)}")
         return False
 
+# Bulk "Send to Linus"
+LINUS_MERGE_BATCH_SIZE = 50
+
+def is_po_amount_error(error_pattern):
+    """True for the "invoice amount is greater than the amount available on the PO" error"""
+    error_pattern_lower = str(error_pattern).lower()
+    return (
+        "invoice amount is greater than" in error_pattern_lower and
+        "available on the po" in error_pattern_lower
+    )
+
+def build_linus_requests(overrun_invoices, po_ledger, months_into_year):
+    """
+    Build one Linus request per PO from a set of PO-overrun hold invoices.
+
+    The largest hold invoice represents its PO; the balance figures come from
+    the PO ledger, so POs missing from Purchase_Orders are left out, as are
+    POs with no supplement to request (no PO amount, or nothing over budget).
+    """
+    if overrun_invoices.empty or po_ledger.empty:
+        return pd.DataFrame(columns=LINUS_REQUEST_FIELDS)
+
+    invoices = (
+        overrun_invoices.dropna(subset=['PO_Name'])
+        .sort_values('Total_Amount__c', ascending=False)
+        .drop_duplicates('PO_Name')
+    )
+    requests = invoices[['Invoice_Id', 'Invoice_Name', 'PO_Name', 'Vendor__Name', 'Total_Amount__c']].merge(
+        po_ledger.reset_index(drop=True)[[
+            'PO_Name', 'Total_Approved_PO', 'Invoiced_Year_To_Date', 'Remaining_Balance',
+            'Total_Pending', 'Expected_Additional', 'Supplemental_Amount'
+        ]],
+        on='PO_Name'
+    )
+    requests = requests[requests['Supplemental_Amount'] > 0]
+    requests = requests.rename(columns={'Vendor__Name': 'Vendor_Name', 'Total_Amount__c': 'Invoice_Amount'})
+    requests['Request_Id'] = [f"REQ-{uuid.uuid4().hex[:12].upper()}" for _ in range(len(requests))]
+    requests['Months_Into_Year'] = float(months_into_year)
+    return requests[LINUS_REQUEST_FIELDS]
+
+def send_linus_requests(_conn, requests_df, schema_name="default"):
+    """
+    Write a batch of Linus requests with MERGE, skipping POs that already
+    have a pending request.
+
+    Returns a ``(sent, skipped)`` tuple, or None if the write failed.
+    """
+    try:
+        pending_pos = {row[0] for row in execute_statement(
+            _conn, f"SELECT DISTINCT PO_Name FROM {schema_name}.Linus_Requests WHERE Status = :status",
+            {'status': 'Pending'}, fetch=True
+        )}
+        new_requests = requests_df[~requests_df['PO_Name'].isin(pending_pos)]
+
+        for start in range(0, len(new_requests), LINUS_MERGE_BATCH_SIZE):
+            batch = new_requests.iloc[start:start + LINUS_MERGE_BATCH_SIZE]
+            params = {}
+            rows = []
+            for i, request in enumerate(batch.to_dict('records')):
+                markers, request_params = linus_request_params(request, f"_{i}")
+                params.update(request_params)
+                rows.append(f"({', '.join(markers)})")
+
+            # The ON clause re-checks pending requests, so concurrent sweeps don't double up
+            execute_statement(_conn, f"""
+            MERGE INTO {schema_name}.Linus_Requests AS target
+            USING (VALUES {', '.join(rows)}) AS source({', '.join(LINUS_REQUEST_FIELDS)})
+            ON target.PO_Name = source.PO_Name AND target.Status = 'Pending'
+            WHEN NOT MATCHED THEN INSERT (
+                {', '.join(LINUS_REQUEST_FIELDS)},
+                Request_Date, Created_By, Status, LastModifiedDate
+            ) VALUES (
+                {', '.join(f'source.{field}' for field in LINUS_REQUEST_FIELDS)},
+                CURRENT_TIMESTAMP, 'Streamlit App', 'Pending', CURRENT_TIMESTAMP
+            )
+            """, params)
+
+        return len(new_requests), len(requests_df) - len(new_requests)
+    except Exception as e:
+        st.error(f"Error sending requests: {str(e)}")
+        return None
+
 # Main app
 def main():
     st.title("🔍 Hold Busters - Invoice Analysis Dashboard")
@@ -203,9 +1726,18 @@ def main():
     # Sidebar configuration
     st.sidebar.header("⚙️ Configuration")
     
+    backend, data_dir = get_backend()
+    
     # Get default schema from secrets
     default_schema = "default"
-    if hasattr(st, 'secrets') and 'databricks' in st.secrets:
+    if backend == "local":
+        try:
+            from local_backend import LOCAL_SCHEMA
+            default_schema = LOCAL_SCHEMA
+        except ImportError:
+            # get_local_connection reports the missing dependency
+            pass
+    elif hasattr(st, 'secrets') and 'databricks' in st.secrets:
         if 'default_schema' in st.secrets.databricks:
             default_schema = st.secrets.databricks.default_schema
     
@@ -213,11 +1745,27 @@ def main():
     schema_name = st.sidebar.text_input(
         "Databricks Schema Name",
         value=default_schema,
-        help="Enter the name of your Databricks schema/database (e.g., default, invoices_db, hackathon/hackathon_build_hold_busters)"
+        help="Enter the name of your Databricks schema/database as schema or catalog.schema (e.g., default, invoices_db, hackathon.hackathon_build_hold_busters)"
+    ).strip()
+
+    # The schema is the only part of the SQL that can't be a bound parameter
+    if not SCHEMA_NAME_PATTERN.match(schema_name):
+        st.sidebar.error("❌ Invalid schema name. Use `schema` or `catalog.schema` (letters, digits, underscores, or a `backtick-quoted` name).")
+        return
+
+    preload_details = st.sidebar.checkbox(
+        "Preload invoice lines & responses",
+        value=False,
+        help="Load the full invoice_lines and Integration_Responses tables up front for instant drill-downs. When off, each opened invoice is fetched on demand."
     )
     
     # Get connection
-    conn = get_databricks_connection()
+    conn = get_connection(backend, data_dir)
+    if backend == "local" and conn is not None:
+        st.sidebar.caption(
+            f"🦆 Local backend: {conn.row_counts.get('invoices', 0):,} invoices from `{data_dir}` "
+            f"loaded in {conn.load_seconds:.2f}s"
+        )
     
     if conn is None:
         st.warning("⚠️ Not connected to Databricks. Please configure your credentials.")
@@ -270,19 +1818,30 @@ def main():
         
         return
     
-    st.success("✅ Connected to Databricks!")
+    st.success("✅ Connected to the local backend!" if backend == "local" else "✅ Connected to Databricks!")
     
-    # Refresh button
-    if st.sidebar.button("🔄 Refresh Data"):
+    # Refresh buttons: cached tables are refreshed incrementally (changed rows only);
+    # a full reload refetches everything, e.g. after rows were deleted upstream
+    refresh_col, reload_col = st.sidebar.columns(2)
+    refresh_data = refresh_col.button("🔄 Refresh Data", help="Fetch only rows changed since the last load")
+    full_reload = reload_col.button("♻️ Full Reload", help="Drop all cached data and refetch every table")
+    if refresh_data or full_reload:
+        if full_reload:
+            clear_result_cache()
+        else:
+            expire_result_cache()
         st.cache_data.clear()
+        get_invoice_windows.clear()
+        get_invoice_lines_index.clear()
+        get_integration_responses_index.clear()
         st.rerun()
     
     # Load data
-    with st.spinner("Loading data from Databricks..."):
+    with st.spinner("Loading data from Databricks..."), perf_section("Load data"):
         try:
-            invoices_df = get_invoices(conn, schema_name)
+            filter_options = get_invoice_filter_options(conn, schema_name)
             
-            if invoices_df.empty:
+            if filter_options.empty:
                 st.warning(f"⚠️ No data found in schema: `{schema_name}`")
                 st.info("""
                 **Troubleshooting:**
@@ -295,13 +1854,16 @@ def main():
             
             # Try to load related tables
             try:
-                invoice_lines_df = get_invoice_lines(conn, schema_name)
+                if preload_details:
+                    invoice_lines_lookup = get_invoice_lines_index(conn, schema_name)
+                else:
+                    invoice_lines_lookup = InvoicePointLookup(get_invoice_lines_for_invoice, conn, schema_name)
                 projects_df = get_projects(conn, schema_name)
-                purchase_orders_df = get_purchase_orders(conn, schema_name)
+                po_ledger = get_po_ledger(conn, schema_name)
             except:
-                invoice_lines_df = pd.DataFrame()
+                invoice_lines_lookup = InvoiceIdIndex(pd.DataFrame())
                 projects_df = pd.DataFrame()
-                purchase_orders_df = pd.DataFrame()
+                po_ledger = pd.DataFrame()
                 
         except Exception as e:
             st.error(f"❌ Error loading data: {str(e)}")
@@ -312,56 +1874,57 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.header("🔍 Filters")
     
-    status_options = ['All'] + sorted(invoices_df['Status'].unique().tolist())
+    status_options = ['All'] + filter_options['Status'].tolist()
     selected_status = st.sidebar.multiselect(
         "Invoice Status",
         options=status_options,
         default=['All']
     )
     
-    # Apply filters
-    filtered_df = invoices_df.copy()
+    statuses = ()
+    status_bounds = filter_options
     if 'All' not in selected_status and selected_status:
-        filtered_df = filtered_df[filtered_df['Status'].isin(selected_status)]
+        statuses = tuple(selected_status)
+        status_bounds = filter_options[filter_options['Status'].isin(statuses)]
     
-    # Date range filter
-    if 'Invoice_Date__c' in filtered_df.columns:
-        filtered_df['Invoice_Date__c'] = pd.to_datetime(filtered_df['Invoice_Date__c'])
-        min_date = filtered_df['Invoice_Date__c'].min()
-        max_date = filtered_df['Invoice_Date__c'].max()
-        
-        date_range = st.sidebar.date_input(
-            "Invoice Date Range",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=max_date
-        )
-        
-        if len(date_range) == 2:
-            filtered_df = filtered_df[
-                (filtered_df['Invoice_Date__c'].dt.date >= date_range[0]) &
-                (filtered_df['Invoice_Date__c'].dt.date <= date_range[1])
-            ]
+    # Date range filter (bounds come from the statuses selected above)
+    min_date = pd.to_datetime(status_bounds['Min_Date']).min().date()
+    max_date = pd.to_datetime(status_bounds['Max_Date']).max().date()
+    
+    date_range = st.sidebar.date_input(
+        "Invoice Date Range",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
+    )
+    selected_dates = tuple(date_range) if len(date_range) == 2 else None
+    
+    # KPI Metrics (aggregated in the warehouse)
+    with perf_section("KPIs"):
+        kpis = get_invoice_kpis(conn, schema_name, statuses, selected_dates)
+    
+    if kpis.empty or kpis['Total_Invoices'].iloc[0] == 0:
+        st.info("No invoices match the selected filters.")
+        return
     
-    # KPI Metrics
     st.subheader("📊 Key Performance Indicators")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_invoices = len(filtered_df)
+        total_invoices = int(kpis['Total_Invoices'].iloc[0])
         st.metric("Total Invoices", f"{total_invoices:,}")
     
     with col2:
-        on_hold = len(filtered_df[filtered_df['Status'] == 'Hold'])
+        on_hold = int(kpis['On_Hold'].iloc[0])
         hold_pct = (on_hold / total_invoices * 100) if total_invoices > 0 else 0
         st.metric("On Hold", f"{on_hold:,}", f"{hold_pct:.1f}%")
     
     with col3:
-        total_amount = filtered_df['Total_Amount__c'].sum()
+        total_amount = kpis['Total_Amount'].iloc[0]
         st.metric("Total Amount", f"${total_amount:,.2f}")
     
     with col4:
-        avg_days = filtered_df['Days_Pending_Approval__c'].mean()
+        avg_days = kpis['Avg_Days_Pending'].iloc[0]
         st.metric("Avg Days Pending", f"{avg_days:.1f}")
     
     st.markdown("---")
@@ -375,15 +1938,15 @@ def main():
         "💾 Custom Query"
     ])
     
-    with tab1:
+    with tab1, perf_section("Overview tab"):
         col1, col2 = st.columns(2)
         
         with col1:
             # Status distribution pie chart
-            status_counts = filtered_df['Status'].value_counts()
+            status_counts = get_status_counts(conn, schema_name, statuses, selected_dates)
             fig_status = px.pie(
-                values=status_counts.values,
-                names=status_counts.index,
+                values=status_counts['Invoice_Count'],
+                names=status_counts['Status'],
                 title="Invoice Status Distribution",
                 hole=0.4,
                 color_discrete_sequence=px.colors.qualitative.Set3
@@ -392,25 +1955,23 @@ def main():
         
         with col2:
             # Top vendors by amount
-            if 'Vendor__Name' in filtered_df.columns:
-                top_vendors = filtered_df.groupby('Vendor__Name')['Total_Amount__c'].sum().sort_values(ascending=False).head(10)
+            top_vendors = get_top_vendors(conn, schema_name, statuses, selected_dates)
+            if not top_vendors.empty:
                 fig_vendors = px.bar(
-                    x=top_vendors.values,
-                    y=top_vendors.index,
+                    x=top_vendors['Total_Amount'],
+                    y=top_vendors['Vendor__Name'],
                     orientation='h',
                     title="Top 10 Vendors by Amount",
                     labels={'x': 'Total Amount ($)', 'y': 'Vendor'},
-                    color=top_vendors.values,
+                    color=top_vendors['Total_Amount'],
                     color_continuous_scale='Blues'
                 )
                 st.plotly_chart(fig_vendors, use_container_width=True)
         
         # Timeline chart
-        if 'Invoice_Date__c' in filtered_df.columns:
-            timeline_df = filtered_df.groupby(
-                filtered_df['Invoice_Date__c'].dt.to_period('M')
-            )['Total_Amount__c'].sum().reset_index()
-            timeline_df['Invoice_Date__c'] = timeline_df['Invoice_Date__c'].dt.to_timestamp()
+        timeline_df = get_monthly_amounts(conn, schema_name, statuses, selected_dates)
+        if not timeline_df.empty:
+            timeline_df['Invoice_Date__c'] = pd.to_datetime(timeline_df['Invoice_Date__c'])
             
             fig_timeline = px.line(
                 timeline_df,
@@ -423,43 +1984,123 @@ def main():
             fig_timeline.update_traces(line_color='#1f77b4', line_width=3)
             st.plotly_chart(fig_timeline, use_container_width=True)
     
-    with tab2:
+    # Row-level invoices are only needed by search, "All rows" and the analysis tabs, so they
+    # load after the first paint; the paged grid queries its page directly
+    def load_filtered_invoices():
+        with st.spinner("Loading invoices..."), perf_section("Invoice view"):
+            return get_invoice_windows(conn, schema_name).filtered(statuses, selected_dates)
+    
+    filtered_df = None
+    
+    with tab2, perf_section("Invoice Details tab"):
         st.subheader("Invoice Details Table")
         
         # Search functionality
-        search_term = st.text_input("🔍 Search by Invoice Name, Vendor, or ID", "")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            search_term = st.text_input("🔍 Search by Invoice Name, Vendor, PO, or ID", "")
+        with col2:
+            search_mode = st.radio("Match", options=SEARCH_MODES, horizontal=True)
         
+        search_df = None
         if search_term:
-            search_df = filtered_df[
-                filtered_df.apply(lambda row: search_term.lower() in str(row).lower(), axis=1)
-            ]
-        else:
-            search_df = filtered_df
+            filtered_df = load_filtered_invoices()
+            search_df = get_invoice_windows(conn, schema_name).search(search_term, search_mode, statuses, selected_dates)
         
-        # Display count
-        st.info(f"Showing {len(search_df)} of {len(filtered_df)} invoices")
+        grid_mode = st.radio(
+            "Grid mode",
+            options=["Paged", "All rows"],
+            horizontal=True,
+            help="Paged fetches only the visible page from Databricks; All rows renders every filtered invoice"
+        )
         
-        # Display dataframe with formatting
-        display_df = search_df.copy()
-        if 'Invoice_Date__c' in display_df.columns:
-            display_df['Invoice_Date__c'] = display_df['Invoice_Date__c'].dt.strftime('%Y-%m-%d')
+        if grid_mode == "Paged" and not search_term:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sort_by = st.selectbox("Sort by", options=list(INVOICE_PAGE_SORT_KEYS.keys()))
+            with col2:
+                descending = st.radio("Order", options=["Descending", "Ascending"], horizontal=True) == "Descending"
+            with col3:
+                page_size = st.selectbox("Rows per page", options=INVOICE_PAGE_SIZES, index=1)
+            
+            # Cursor stack: one entry per page already visited; reset when the query changes
+            page_state = (schema_name, statuses, selected_dates, sort_by, descending, page_size)
+            if st.session_state.get('invoice_page_state') != page_state:
+                st.session_state['invoice_page_state'] = page_state
+                st.session_state['invoice_page_cursors'] = [None]
+            cursors = st.session_state['invoice_page_cursors']
+            
+            page_df = get_invoice_page(
+                conn, schema_name, statuses, selected_dates,
+                sort_by, descending, page_size, cursors[-1]
+            )
+            
+            page_number = len(cursors)
+            total_pages = max(1, -(-total_invoices // page_size))
+            if page_df.empty:
+                # The page query failed (its error is shown above) or returned nothing
+                st.info(f"No invoices to show on page {page_number}.")
+                if page_number > 1 and st.button("⬅️ Back to first page"):
+                    del cursors[1:]
+                    st.rerun()
+            else:
+                first_row = (page_number - 1) * page_size + 1
+                last_row = first_row + len(page_df) - 1
+                st.info(f"Showing rows {first_row:,}-{last_row:,} of {total_invoices:,} invoices (page {page_number} of {total_pages})")
+                
+                display_df = page_df.drop(columns=['Sort_Key'])
+                if 'Invoice_Date__c' in display_df.columns:
+                    display_df['Invoice_Date__c'] = pd.to_datetime(display_df['Invoice_Date__c']).dt.strftime('%Y-%m-%d')
+                
+                st.dataframe(
+                    display_df,
+                    use_container_width=True,
+                    height=400
+                )
+                
+                col1, col2, _ = st.columns([1, 1, 4])
+                with col1:
+                    if st.button("⬅️ Previous", disabled=page_number == 1):
+                        cursors.pop()
+                        st.rerun()
+                with col2:
+                    if st.button("Next ➡️", disabled=len(page_df) < page_size or page_number >= total_pages):
+                        cursors.append(page_cursor(page_df))
+                        st.rerun()
+        else:
+            if search_df is None:
+                filtered_df = search_df = load_filtered_invoices()
+            
+            # Display count
+            st.info(f"Showing {len(search_df)} of {len(filtered_df)} invoices")
+            
+            # Display dataframe with formatting
+            display_df = search_df
+            if 'Invoice_Date__c' in display_df.columns:
+                display_df = display_df.assign(Invoice_Date__c=display_df['Invoice_Date__c'].dt.strftime('%Y-%m-%d'))
+            
+            st.dataframe(
+                display_df,
+                use_container_width=True,
+                height=400
+            )
         
-        st.dataframe(
-            display_df,
-            use_container_width=True,
-            height=400
-        )
+        # Download button: the CSV is only built when clicked (outside the script run, so no st.* calls)
+        def filtered_invoices_csv():
+            export_df = search_df if search_df is not None else get_invoice_windows(conn, schema_name).filtered(statuses, selected_dates)
+            return export_df.to_csv(index=False)
         
-        # Download button
-        csv = search_df.to_csv(index=False)
         st.download_button(
             label="📥 Download Filtered Data as CSV",
-            data=csv,
+            data=filtered_invoices_csv,
             file_name=f"invoices_filtered_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv"
         )
     
-    with tab3:
+    if filtered_df is None:
+        filtered_df = load_filtered_invoices()
+    
+    with tab3, perf_section("Deep Analysis tab"):
         st.subheader("Deep Dive Analysis")
         
         col1, col2 = st.columns(2)
@@ -490,7 +2131,7 @@ def main():
         
         # State analysis
         if 'State__c' in filtered_df.columns:
-            state_summary = filtered_df.groupby('State__c').agg({
+            state_summary = filtered_df.groupby('State__c', observed=True).agg({
                 'Invoice_Id': 'count',
                 'Total_Amount__c': 'sum',
                 'Days_Pending_Approval__c': 'mean'
@@ -525,13 +2166,34 @@ def main():
                     color_continuous_scale='Reds'
                 )
                 st.plotly_chart(fig_integration, use_container_width=True)
-    
-    with tab4:
+
+        # PO supplement needs across the whole portfolio
+        if not po_ledger.empty:
+            st.subheader("📨 POs Needing Supplements")
+            needs_supplement = po_ledger[po_ledger['Supplemental_Amount'] > 0].sort_values(
+                'Supplemental_Amount', ascending=False
+            )
+            st.caption(f"{len(needs_supplement)} of {len(po_ledger)} POs need a supplement (all dated invoices, sidebar filters not applied)")
+            st.dataframe(
+                needs_supplement[[
+                    'PO_Name', 'Vendor__Name', 'Invoice_Count', 'Hold_Count', 'Total_Approved_PO',
+                    'Remaining_Balance', 'Total_Pending', 'Supplemental_Amount'
+                ]].style.format({
+                    'Total_Approved_PO': '${:,.2f}',
+                    'Remaining_Balance': '${:,.2f}',
+                    'Total_Pending': '${:,.2f}',
+                    'Supplemental_Amount': '${:,.2f}'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+    with tab4, perf_section("Error Analysis tab"):
         st.subheader("🚨 Invoices on Hold - Error Pattern Analysis")
         st.markdown("Drill-down by integration error patterns to identify and resolve holds")
         
         # Filter for invoices on hold
-        hold_invoices = filtered_df[filtered_df['Status'] == 'Hold'].copy()
+        hold_invoices = filtered_df[filtered_df['Status'] == 'Hold']
         
         if hold_invoices.empty:
             st.success("🎉 No invoices currently on hold!")
@@ -552,22 +2214,14 @@ def main():
             
             # Extract error patterns from Integration_Error_Message__c
             if 'Integration_Error_Message__c' in hold_invoices.columns:
-                # Clean and extract error patterns
-                hold_invoices['Error_Pattern'] = hold_invoices['Integration_Error_Message__c'].fillna('No Error Message')
-                
-                # Extract first line or main error message
-                hold_invoices['Error_Summary'] = hold_invoices['Error_Pattern'].apply(
-                    lambda x: str(x).split('\n')[0] if pd.notna(x) else 'No Error Message'
+                # Group by canonical error pattern (pre-bucketed by error_patterns.py when available)
+                error_groups, hold_invoices = get_error_groups(
+                    conn, schema_name, statuses, selected_dates, hold_invoices
                 )
                 
-                # Group by error pattern
-                error_groups = hold_invoices.groupby('Error_Summary').agg({
-                    'Invoice_Id': 'count',
-                    'Total_Amount__c': 'sum',
-                    'Days_Pending_Approval__c': 'mean'
-                }).reset_index()
-                error_groups.columns = ['Error Pattern', 'Invoice Count', 'Total Amount', 'Avg Days Pending']
-                error_groups = error_groups.sort_values('Invoice Count', ascending=False)
+                unclassified = error_groups[error_groups['Pattern Id'] == UNCLASSIFIED_PATTERN_ID]
+                if not unclassified.empty:
+                    st.caption(f"ℹ️ {int(unclassified['Invoice Count'].iloc[0])} invoices have not been classified yet. Run `python error_patterns.py` to update the error patterns table.")
                 
                 # Display error pattern summary
                 st.subheader("📊 Error Pattern Summary")
@@ -590,33 +2244,77 @@ def main():
                 
                 # Drill-down section
                 st.subheader("🔍 Drill-Down by Error Pattern")
-                st.markdown("Click to expand each error pattern and see affected invoices")
+                st.markdown("Select an error pattern to see affected invoices")
+                
+                st.dataframe(
+                    error_groups.drop(columns=['Pattern Id']).style.format({
+                        'Total Amount': '${:,.2f}',
+                        'Avg Days Pending': '{:.1f}'
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                
+                # Bulk "Send to Linus" for every PO-overrun hold
+                overrun_pattern_ids = error_groups.loc[
+                    error_groups['Error Pattern'].map(is_po_amount_error), 'Pattern Id'
+                ]
+                overrun_holds = hold_invoices[hold_invoices['Pattern_Id'].isin(overrun_pattern_ids)]
+                if not overrun_holds.empty:
+                    st.markdown("#### 📨 Bulk Send to Linus")
+                    linus_requests = build_linus_requests(overrun_holds, po_ledger, months_left_in_year())
+                    st.caption(
+                        f"{len(overrun_holds)} holds matching the sidebar filters exceed the amount available on the PO, "
+                        f"across {overrun_holds['PO_Name'].nunique()} POs; {len(linus_requests)} of those POs need a supplement. "
+                        f"One request is sent per PO; POs with a pending request are skipped."
+                    )
+                    if st.button("📨 Send filtered PO-overrun holds to Linus", key="send_linus_bulk", type="primary", disabled=linus_requests.empty):
+                        result = send_linus_requests(conn, linus_requests, schema_name)
+                        if result is not None:
+                            sent, skipped = result
+                            st.success(f"✅ Sent {sent} requests to Linus ({skipped} POs already had a pending request)")
+                    st.markdown("---")
                 
-                # Load integration responses
-                try:
-                    integration_responses = get_integration_responses(conn, schema_name)
-                except:
-                    integration_responses = pd.DataFrame()
+                # Only the opened pattern builds its tables, CSV and sub-queries
+                pattern_labels = {
+                    row['Pattern Id']: f"🔴 {row['Error Pattern'][:100]}... ({row['Invoice Count']} invoices, ${row['Total Amount']:,.2f})"
+                    for _, row in error_groups.iterrows()
+                }
+                selected_pattern_id = st.selectbox(
+                    "Open error pattern",
+                    options=[None] + list(pattern_labels.keys()),
+                    format_func=lambda pattern: '-- Select an Error Pattern --' if pattern is None else pattern_labels[pattern],
+                    key="error_pattern_selector"
+                )
                 
-                # Create expandable sections for each error pattern
-                for idx, row in error_groups.iterrows():
+                if selected_pattern_id is not None:
+                    row = error_groups[error_groups['Pattern Id'] == selected_pattern_id].iloc[0]
+                    pattern_id = row['Pattern Id']
                     error_pattern = row['Error Pattern']
-                    invoice_count = row['Invoice Count']
-                    total_amt = row['Total Amount']
                     
-                    with st.expander(f"🔴 {error_pattern[:100]}... ({invoice_count} invoices, ${total_amt:,.2f})"):
+                    # Integration responses: preloaded index or per-invoice fetch
+                    try:
+                        if preload_details:
+                            integration_responses_lookup = get_integration_responses_index(conn, schema_name)
+                        else:
+                            integration_responses_lookup = InvoicePointLookup(get_integration_responses_for_invoice, conn, schema_name)
+                    except:
+                        integration_responses_lookup = InvoiceIdIndex(pd.DataFrame())
+                    
+                    with st.container(), perf_section("Error pattern drill-down") as drill_down:
+                        drill_down['detail'] = pattern_id
                         # Filter invoices for this error pattern and sort by amount descending
-                        pattern_invoices = hold_invoices[hold_invoices['Error_Summary'] == error_pattern].copy()
+                        pattern_invoices = hold_invoices[hold_invoices['Pattern_Id'] == pattern_id]
                         pattern_invoices = pattern_invoices.sort_values('Total_Amount__c', ascending=False)
                         
-                        # Calculate Days Since Approval
+                        # Calculate Days Since Approval (Approval_Date__c is parsed tz-naive by compact_invoices)
                         if 'Approval_Date__c' in pattern_invoices.columns:
-                            # Use timezone-naive datetime for both to avoid tz-aware/tz-naive mismatch
                             now = pd.Timestamp.now().tz_localize(None)
-                            approval_dates = pd.to_datetime(pattern_invoices['Approval_Date__c']).dt.tz_localize(None)
-                            pattern_invoices['Days_Since_Approval'] = (now - approval_dates).dt.days
+                            pattern_invoices = pattern_invoices.assign(
+                                Days_Since_Approval=(now - pattern_invoices['Approval_Date__c']).dt.days
+                            )
                         else:
-                            pattern_invoices['Days_Since_Approval'] = None
+                            pattern_invoices = pattern_invoices.assign(Days_Since_Approval=None)
                         
                         # Display summary
                         st.markdown(f"**Full Error Message:**")
@@ -624,23 +2322,12 @@ def main():
                             "Error Details",
                             value=error_pattern,
                             height=100,
-                            key=f"error_{idx}",
+                            key=f"error_{pattern_id}",
                             label_visibility="collapsed"
                         )
                         
                         st.markdown(f"**Affected Invoices ({len(pattern_invoices)}):**")
                         
-                        # Display invoices in a table
-                        display_cols = ['Invoice_Name', 'Vendor__Name', 'Total_Amount__c', 
-                                       'Days_Pending_Approval__c', 'Invoice_Date__c', 'State__c']
-                        available_cols = [col for col in display_cols if col in pattern_invoices.columns]
-                        
-                        pattern_display = pattern_invoices[available_cols].copy()
-                        if 'Invoice_Date__c' in pattern_display.columns:
-                            pattern_display['Invoice_Date__c'] = pd.to_datetime(
-                                pattern_display['Invoice_Date__c']
-                            ).dt.strftime('%Y-%m-%d')
-                        
                         # Display invoices as a table
                         st.markdown("---")
                         st.markdown(f"**📋 Invoices (Click a row to view details):**")
@@ -650,14 +2337,11 @@ def main():
                                        'Days_Since_Approval', 'Invoice_Date__c', 'State__c']
                         available_cols = [col for col in display_cols if col in pattern_invoices.columns]
                         
-                        table_display = pattern_invoices[available_cols + ['Invoice_Id']].copy()
-                        table_display = table_display.reset_index(drop=True)
+                        table_display = pattern_invoices[available_cols + ['Invoice_Id']].reset_index(drop=True)
                         
-                        # Format columns for display
+                        # Format columns for display (Invoice_Date__c is already parsed)
                         if 'Invoice_Date__c' in table_display.columns:
-                            table_display['Invoice_Date__c'] = pd.to_datetime(
-                                table_display['Invoice_Date__c']
-                            ).dt.strftime('%Y-%m-%d')
+                            table_display['Invoice_Date__c'] = table_display['Invoice_Date__c'].dt.strftime('%Y-%m-%d')
                         
                         # Rename columns for display
                         column_renames = {
@@ -686,10 +2370,11 @@ def main():
                         selected_invoice_name = st.selectbox(
                             "🔎 Select an invoice to view line items and integration response:",
                             options=['-- Select an Invoice --'] + table_display['Invoice'].tolist(),
-                            key=f"invoice_selector_{idx}"
+                            key=f"invoice_selector_{pattern_id}"
                         )
                         
                         if selected_invoice_name and selected_invoice_name != '-- Select an Invoice --':
+                            drill_down['detail'] = f"{pattern_id} / {selected_invoice_name}"
                             # Get the selected invoice data
                             selected_idx = table_display[table_display['Invoice'] == selected_invoice_name].index[0]
                             invoice_id = table_display.loc[selected_idx, 'Invoice_Id']
@@ -700,31 +2385,25 @@ def main():
                             
                             # Check if this is a PO amount error
                             # Specific pattern: "The invoice amount is greater than the amount available on the PO"
-                            error_pattern_lower = error_pattern.lower()
-                            is_po_amount_error = (
-                                "invoice amount is greater than" in error_pattern_lower and 
-                                "available on the po" in error_pattern_lower
-                            )
+                            po_amount_error = is_po_amount_error(error_pattern)
                             
                             # Debug info - ALWAYS show for troubleshooting
                             st.caption(f"🔍 Error Pattern Check: '{error_pattern[:100]}'...")
-                            st.caption(f"✅ PO Amount Error Detected: {is_po_amount_error}")
+                            st.caption(f"✅ PO Amount Error Detected: {po_amount_error}")
                             
-                            if is_po_amount_error:
+                            if po_amount_error:
                                 st.success(f"📨 'Send to Linus' tab is enabled for this invoice!")
                             
                             # Create columns for drill-downs
-                            if is_po_amount_error:
+                            if po_amount_error:
                                 col1, col2, col3 = st.columns(3)
                             else:
                                 col1, col2 = st.columns(2)
                             
                             with col1:
                                 st.markdown("### 📋 Invoice Line Items")
-                                if not invoice_lines_df.empty:
-                                    invoice_lines = invoice_lines_df[
-                                        invoice_lines_df['Invoice_Id'] == invoice_id
-                                    ]
+                                if not invoice_lines_lookup.empty:
+                                    invoice_lines = invoice_lines_lookup.get(invoice_id)
                                     
                                     if not invoice_lines.empty:
                                         line_display_cols = ['Invoice_Line_Number__c', 'Invoice_Amount__c', 
@@ -733,7 +2412,7 @@ def main():
                                         available_line_cols = [col for col in line_display_cols if col in invoice_lines.columns]
                                         
                                         # Format and display
-                                        line_display = invoice_lines[available_line_cols].copy()
+                                        line_display = invoice_lines[available_line_cols]
                                         st.dataframe(
                                             line_display,
                                             use_container_width=True,
@@ -751,10 +2430,8 @@ def main():
                             
                             with col2:
                                 st.markdown("### 🔗 Integration Response")
-                                if not integration_responses.empty:
-                                    invoice_response = integration_responses[
-                                        integration_responses['Invoice_Id'] == invoice_id
-                                    ]
+                                if not integration_responses_lookup.empty:
+                                    invoice_response = integration_responses_lookup.get(invoice_id)
                                     
                                     if not invoice_response.empty:
                                         # Get all response fields
@@ -778,7 +2455,7 @@ def main():
                                                     "Raw Request",
                                                     value=str(infinium_request),
                                                     height=150,
-                                                    key=f"request_{idx}",
+                                                    key=f"request_{pattern_id}",
                                                     label_visibility="collapsed"
                                                 )
                                         
@@ -792,7 +2469,7 @@ def main():
                                                     "Raw Response",
                                                     value=str(infinium_response),
                                                     height=150,
-                                                    key=f"response_{idx}",
+                                                    key=f"response_{pattern_id}",
                                                     label_visibility="collapsed"
                                                 )
                                     else:
@@ -801,12 +2478,12 @@ def main():
                                     st.warning("Integration responses data not loaded")
                             
                             # Add "Send to Linus" tab for PO amount errors
-                            if is_po_amount_error:
+                            if po_amount_error:
                                 with col3:
                                     st.markdown("### 📨 Send to Linus")
                                     
                                     # Debug information
-                                    st.caption(f"📦 Purchase Orders loaded: {len(purchase_orders_df)} records")
+                                    st.caption(f"📦 POs in ledger: {len(po_ledger)} records")
                                     
                                     # Get PO_Name from the invoice
                                     po_name = invoice_row.get('PO_Name', None)
@@ -816,43 +2493,17 @@ def main():
                                     else:
                                         st.warning("⚠️ Invoice does not have a PO_Name value")
                                     
-                                    if po_name and not purchase_orders_df.empty:
-                                        # Get PO details
-                                        po_info = purchase_orders_df[purchase_orders_df['PO_Name'] == po_name]
-                                        
-                                        if not po_info.empty:
-                                            total_approved_po = po_info['PO_Amount'].iloc[0] if 'PO_Amount' in po_info.columns else 0
-                                            
-                                            # Calculate Months into Year (remaining months with 1 decimal)
-                                            import datetime as dt
-                                            today = dt.datetime.now()
-                                            end_of_year = dt.datetime(today.year, 12, 31)
-                                            months_remaining = (end_of_year - today).days / 30.0
-                                            months_into_year = round(months_remaining, 1)
-                                            
-                                            # Get all invoices for this PO_Name
-                                            po_invoices = invoices_df[invoices_df['PO_Name'] == po_name].copy()
-                                            
-                                            # Invoiced Year to Date - Sum of Total_Invoice_Amount__c for all invoices (irrespective of status)
-                                            # Note: Using Total_Amount__c as Total_Invoice_Amount__c may not exist
-                                            invoiced_ytd = po_invoices['Total_Amount__c'].sum() if not po_invoices.empty else 0
-                                            
-                                            # Remaining Balance - Total Approved PO - Sum for Paid and Committed
-                                            paid_committed = po_invoices[
-                                                po_invoices['Status'].isin(['Paid', 'Committed'])
-                                            ]['Total_Amount__c'].sum() if not po_invoices.empty else 0
-                                            remaining_balance = total_approved_po - paid_committed
-                                            
-                                            # Total Pending - Sum for Draft, Submitted, Approved, Hold
-                                            total_pending = po_invoices[
-                                                po_invoices['Status'].isin(['Draft', 'Submitted', 'Approved', 'Hold'])
-                                            ]['Total_Amount__c'].sum() if not po_invoices.empty else 0
-                                            
-                                            # Expected Additional - 10% of Total Pending
-                                            expected_additional = total_pending * 0.10
-                                            
-                                            # Supplemental Amount
-                                            supplemental_amount = (total_pending + expected_additional) - remaining_balance
+                                    if po_name and not po_ledger.empty:
+                                        if po_name in po_ledger.index:
+                                            # All figures come precomputed from the PO ledger
+                                            po_balance = po_ledger.loc[po_name]
+                                            months_into_year = months_left_in_year()
+                                            total_approved_po = po_balance['Total_Approved_PO']
+                                            invoiced_ytd = po_balance['Invoiced_Year_To_Date']
+                                            remaining_balance = po_balance['Remaining_Balance']
+                                            total_pending = po_balance['Total_Pending']
+                                            expected_additional = po_balance['Expected_Additional']
+                                            supplemental_amount = po_balance['Supplemental_Amount']
                                             
                                             # Display calculated fields
                                             st.markdown("**📊 Calculated Fields:**")
@@ -868,9 +2519,7 @@ def main():
                                             st.markdown("---")
                                             
                                             # Send to Linus button
-                                            if st.button("📨 Send to Linus", key=f"send_linus_{idx}_{invoice_id}", type="primary"):
-                                                import uuid
-                                                
+                                            if st.button("📨 Send to Linus", key=f"send_linus_{pattern_id}_{invoice_id}", type="primary"):
                                                 # Prepare request data
                                                 request_data = {
                                                     'Request_Id': f"REQ-{uuid.uuid4().hex[:12].upper()}",
@@ -901,21 +2550,19 @@ def main():
                                         st.warning("⚠️ PO Name not available or Purchase Orders data not loaded")
                         
                         # Download button for this error pattern
-                        csv_pattern = pattern_invoices.to_csv(index=False)
                         st.download_button(
                             label=f"📥 Download Invoices for this Error Pattern",
-                            data=csv_pattern,
-                            file_name=f"error_pattern_{idx}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            data=lambda: pattern_invoices.to_csv(index=False),
+                            file_name=f"error_pattern_{pattern_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                             mime="text/csv",
-                            key=f"download_{idx}"
+                            key=f"download_{pattern_id}"
                         )
                 
                 # Overall download for all hold invoices
                 st.markdown("---")
-                csv_all_holds = hold_invoices.to_csv(index=False)
                 st.download_button(
                     label="📥 Download All Invoices on Hold",
-                    data=csv_all_holds,
+                    data=lambda: hold_invoices.to_csv(index=False),
                     file_name=f"all_holds_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv"
                 )
@@ -923,7 +2570,7 @@ def main():
                 st.warning("Integration_Error_Message__c column not found in data")
                 st.dataframe(hold_invoices, use_container_width=True)
     
-    with tab5:
+    with tab5, perf_section("Custom Query tab"):
         st.subheader("Custom SQL Query Tool")
         st.info("Execute custom queries against your Databricks tables")
         
@@ -981,5 +2628,9 @@ LIMIT 20;
                     st.warning("Query returned no results")
 
 if __name__ == "__main__":
-    main()
+    start_perf_run()
+    with profile_run() as profiler:
+        main()
+    render_perf_panel()
+    render_profile_panel(profiler)
 
@@ -1,33 +1,52 @@
 """
 Check the schema of existing Databricks tables
+
+Describes every table the uploader writes to and saves the column types
+to schema_registry.json, which upload_to_databricks.py uses to convert
+CSV values on the client:
+
+    python check_schema.py                      # the tables in FILES_TO_UPLOAD
+    python check_schema.py Budget_Lines ...     # specific tables
 """
 
+import sys
+
 from databricks import sql
-import toml
+from upload_to_databricks import (
+    FILES_TO_UPLOAD, SCHEMA_REGISTRY_FILE, get_credentials, get_table_columns,
+    load_schema_registry, save_schema_registry
+)
 
 # Read credentials
-secrets = toml.load('.streamlit/secrets.toml')
-hostname = secrets['databricks']['server_hostname']
-http_path = secrets['databricks']['http_path']
-token = secrets['databricks']['token']
-schema = secrets['databricks'].get('default_schema', 'hackathon.hackathon_build_hold_busters')
+creds = get_credentials()
+schema = creds['schema']
+tables = sys.argv[1:] or list(FILES_TO_UPLOAD)
 
 # Connect
 connection = sql.connect(
-    server_hostname=hostname,
-    http_path=http_path,
-    access_token=token
+    server_hostname=creds['hostname'],
+    http_path=creds['http_path'],
+    access_token=creds['token']
 )
 
 cursor = connection.cursor()
+registry = load_schema_registry()
+
+for table_name in tables:
+    print(f"Table schema for {table_name}:")
+    print("=" * 80)
+    try:
+        columns = get_table_columns(cursor, schema, table_name)
+    except Exception as e:
+        print(f"  ERROR: {str(e)}\n")
+        continue
+    for name, data_type in columns.items():
+        print(f"{name}: {data_type}")
+    print()
+    registry.setdefault(schema, {})[table_name.lower()] = columns
 
-# Check invoice_lines table
-print("Table schema for invoice_lines:")
-print("=" * 80)
-cursor.execute(f"DESCRIBE {schema}.invoice_lines")
-for row in cursor.fetchall():
-    print(f"{row[0]}: {row[1]}")
+save_schema_registry(registry)
+print(f"Saved column types to {SCHEMA_REGISTRY_FILE}")
 
 cursor.close()
 connection.close()
-
@@ -0,0 +1,176 @@
+"""
+Classify invoice integration errors into canonical error patterns
+
+Normalizes Integration_Error_Message__c into a stable pattern ID by
+dropping the embedded "Validation Message" JSON blobs and replacing the
+variable parts (invoice numbers, PO names, amounts, line numbers) with
+placeholders. Run this script to (incrementally) populate the
+Invoice_Error_Patterns table that the Error Analysis tab reads from:
+
+    python error_patterns.py            # classify invoices changed since the last run
+    python error_patterns.py --full     # reclassify every invoice
+"""
+
+import argparse
+import hashlib
+import re
+
+import pandas as pd
+
+NO_ERROR_PATTERN = "No Error Message"
+NO_ERROR_PATTERN_ID = "ERR-NONE"
+UNCLASSIFIED_PATTERN = "Not yet classified (run error_patterns.py)"
+UNCLASSIFIED_PATTERN_ID = "ERR-UNCLASSIFIED"
+
+PATTERNS_TABLE = "Invoice_Error_Patterns"
+MERGE_BATCH_SIZE = 500
+
+# Everything from the first "Validation Message:" on is a JSON payload
+VALIDATION_BLOB = re.compile(r"\s*(?:and\s*)?validation message:.*", re.IGNORECASE | re.DOTALL)
+AMOUNT = re.compile(r"\$\s?\d[\d,]*(?:\.\d+)?")
+# Identifiers: a word starting with a letter that contains a digit (INV-SYN-000006, Synthetic_PO_15, PO-12345)
+IDENTIFIER = re.compile(r"\b[A-Za-z][\w-]*\d[\w-]*")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+TRAILING_CONJUNCTION = re.compile(r"\s+and$", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_error_message(message):
+    """Reduce an integration error message to its canonical pattern text"""
+    if message is None or pd.isna(message) or not str(message).strip():
+        return NO_ERROR_PATTERN
+
+    text = VALIDATION_BLOB.sub("", str(message))
+    text = AMOUNT.sub("<AMOUNT>", text)
+    text = IDENTIFIER.sub("<ID>", text)
+    text = NUMBER.sub("<N>", text)
+    text = WHITESPACE.sub(" ", text).strip()
+    text = TRAILING_CONJUNCTION.sub("", text)
+    return text or NO_ERROR_PATTERN
+
+def pattern_id(pattern):
+    """Stable ID for a canonical pattern text"""
+    if pattern == NO_ERROR_PATTERN:
+        return NO_ERROR_PATTERN_ID
+    return "ERR-" + hashlib.sha1(pattern.encode("utf-8")).hexdigest()[:10].upper()
+
+def classify_error_messages(messages):
+    """
+    Classify a Series of error messages.
+
+    Returns a DataFrame aligned to ``messages.index`` with ``Pattern_Id`` and
+    ``Error_Pattern`` columns. Each distinct message is normalized only once.
+    """
+    codes, uniques = pd.factorize(messages, use_na_sentinel=True)
+    patterns = [normalize_error_message(message) for message in uniques]
+    ids = [pattern_id(pattern) for pattern in patterns]
+    # The NA sentinel (-1) picks the trailing "No Error Message" entry
+    patterns.append(NO_ERROR_PATTERN)
+    ids.append(NO_ERROR_PATTERN_ID)
+    return pd.DataFrame({
+        'Pattern_Id': pd.Series(ids, dtype=object).to_numpy()[codes],
+        'Error_Pattern': pd.Series(patterns, dtype=object).to_numpy()[codes]
+    }, index=messages.index)
+
+def create_patterns_table(cursor, schema):
+    """Create the Invoice_Error_Patterns table if it does not exist yet"""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {schema}.{PATTERNS_TABLE} (
+        Invoice_Id STRING NOT NULL,
+        Pattern_Id STRING NOT NULL,
+        Error_Pattern STRING,
+        Source_LastModifiedDate TIMESTAMP,
+        Classified_At TIMESTAMP
+    )
+    """)
+
+def fetch_changed_invoices(cursor, schema, full=False):
+    """Fetch invoices whose error message may have changed since the last run"""
+    where_sql = "1 = 1"
+    params = None
+
+    if not full:
+        cursor.execute(f"SELECT MAX(Source_LastModifiedDate) FROM {schema}.{PATTERNS_TABLE}")
+        high_water_mark = cursor.fetchone()[0]
+        if high_water_mark is not None:
+            where_sql = "LastModifiedDate >= :high_water_mark"
+            params = {'high_water_mark': high_water_mark}
+            print(f"  Classifying invoices modified since {high_water_mark}")
+
+    cursor.execute(f"""
+    SELECT Invoice_Id, Integration_Error_Message__c, LastModifiedDate
+    FROM {schema}.invoices
+    WHERE {where_sql}
+    """, params)
+    return cursor.fetchall_arrow().to_pandas()
+
+def merge_patterns(cursor, schema, classified):
+    """Upsert classified rows into Invoice_Error_Patterns in batches"""
+    for start in range(0, len(classified), MERGE_BATCH_SIZE):
+        batch = classified.iloc[start:start + MERGE_BATCH_SIZE]
+        params = {}
+        rows = []
+        for i, row in enumerate(batch.itertuples(index=False)):
+            params[f"id_{i}"] = row.Invoice_Id
+            params[f"pattern_id_{i}"] = row.Pattern_Id
+            params[f"pattern_{i}"] = row.Error_Pattern
+            params[f"modified_{i}"] = None if pd.isna(row.LastModifiedDate) else pd.Timestamp(row.LastModifiedDate).to_pydatetime()
+            rows.append(f"(:id_{i}, :pattern_id_{i}, :pattern_{i}, CAST(:modified_{i} AS TIMESTAMP))")
+
+        cursor.execute(f"""
+        MERGE INTO {schema}.{PATTERNS_TABLE} AS target
+        USING (VALUES {', '.join(rows)}) AS source(Invoice_Id, Pattern_Id, Error_Pattern, Source_LastModifiedDate)
+        ON target.Invoice_Id = source.Invoice_Id
+        WHEN MATCHED THEN UPDATE SET
+            Pattern_Id = source.Pattern_Id,
+            Error_Pattern = source.Error_Pattern,
+            Source_LastModifiedDate = source.Source_LastModifiedDate,
+            Classified_At = CURRENT_TIMESTAMP
+        WHEN NOT MATCHED THEN INSERT (Invoice_Id, Pattern_Id, Error_Pattern, Source_LastModifiedDate, Classified_At)
+            VALUES (source.Invoice_Id, source.Pattern_Id, source.Error_Pattern, source.Source_LastModifiedDate, CURRENT_TIMESTAMP)
+        """, params)
+        print(f"  Merged {min(start + MERGE_BATCH_SIZE, len(classified))}/{len(classified)} rows...")
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify invoice integration errors into canonical patterns")
+    parser.add_argument("--full", action="store_true", help="Reclassify every invoice instead of only changed ones")
+    args = parser.parse_args()
+
+    from databricks import sql
+    from upload_to_databricks import get_credentials
+
+    print("=" * 60)
+    print("Classify Invoice Error Patterns")
+    print("=" * 60)
+
+    creds = get_credentials()
+    schema = creds['schema']
+    connection = sql.connect(
+        server_hostname=creds['hostname'],
+        http_path=creds['http_path'],
+        access_token=creds['token']
+    )
+    cursor = connection.cursor()
+
+    try:
+        create_patterns_table(cursor, schema)
+        invoices = fetch_changed_invoices(cursor, schema, full=args.full)
+        print(f"  Read {len(invoices)} invoices")
+
+        if invoices.empty:
+            print("  Nothing to classify - patterns are up to date")
+            return
+
+        classified = pd.concat([
+            invoices[['Invoice_Id', 'LastModifiedDate']],
+            classify_error_messages(invoices['Integration_Error_Message__c'])
+        ], axis=1)
+        print(f"  Found {classified['Pattern_Id'].nunique()} distinct error patterns")
+
+        merge_patterns(cursor, schema, classified)
+        print(f"\nSUCCESS: {schema}.{PATTERNS_TABLE} is up to date")
+    finally:
+        cursor.close()
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,19 @@ Creates test invoices with related data for all statuses
 """
 
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import argparse
+import glob
 import random
 import json
+import os
+import time
 import uuid
 
 # Configuration
@@ -358,7 +368,399 @@ def save_to_databricks(data_dict, schema_name):
         cursor.close()
         connection.close()
 
+# Scale mode: vectorized generation of production-sized datasets for load tests
+# (NumPy for the numbers, Arrow compute for the strings, Arrow tables end to end)
+SCALE_STATUS_WEIGHTS = {"Draft": 0.08, "Submitted": 0.12, "Approved": 0.20, "Paid": 0.40, "Hold": 0.20}
+SCALE_CHUNK_INVOICES = 100_000
+SCALE_COMPRESSION = "zstd"
+
+# Hold error messages, shaped like the ones Infinium returns. {placeholders} are
+# filled per invoice; PO-overrun is used for holds on POs that are over budget.
+PO_OVERRUN_ERROR = (
+    'Detail from service: The invoice amount is greater than the amount available on the PO. and \n '
+    'Validation Message: {\n  "vendorId": "{vendor_id}",\n  "vendorInvoiceNumber": "{invoice}",\n  "status": "Error"\n}'
+)
+SCALE_HOLD_ERRORS = {
+    'Detail from service: Validation errors exist. and \n Validation Message: [\n  {\n    "lineNumber": {line},\n'
+    '    "message": "GL account {gl} is not valid. Cost Code Not Valid For This Project"\n  }\n]': 0.55,
+    'Detail from service: The total amount from the invoice lines does not match the Total Invoice Amount value. and \n '
+    'Validation Message: {\n  "vendorId": "{vendor_id}",\n  "vendorInvoiceNumber": "{invoice}",\n  "status": "Error"\n}': 0.15,
+    "Vendor validation failed: Vendor ID not found in Infinium system": 0.10,
+    "Budget line not found for cost category in project": 0.10,
+    "Approval limit exceeded: Invoice amount requires director approval": 0.05,
+    "Duplicate invoice detected: Similar invoice found with same amount": 0.05,
+}
+
+def numbered_ids(prefix, numbers, width):
+    """String IDs like PREFIX000042 for an array of integers"""
+    digits = pc.utf8_lpad(pc.cast(pa.array(numbers), pa.string()), width=width, padding='0')
+    return pc.binary_join_element_wise(prefix, digits, '')
+
+def scale_ids(prefix, count, width, start=0):
+    """String IDs for start..start+count-1"""
+    return numbered_ids(prefix, np.arange(start, start + count), width)
+
+def concat(*parts):
+    """Element-wise string concatenation of Arrow arrays and Python strings"""
+    return pc.binary_join_element_wise(*parts, '')
+
+def fill_template(template, fields):
+    """Fill a {placeholder} template column-wise; ``fields`` maps placeholder -> Arrow string array"""
+    parts = []
+    for i, piece in enumerate(template.split('{')):
+        name, brace, literal = piece.partition('}')
+        if i and name in fields:
+            parts += [fields[name], literal]
+        else:
+            parts.append(('{' if i else '') + piece)
+    if not any(isinstance(part, pa.Array) for part in parts):
+        return pa.array([template] * len(next(iter(fields.values()))))
+    return concat(*parts)
+
+def dates(values):
+    """numpy datetime64 -> Arrow array with NaT as null"""
+    return pa.array(values, mask=np.isnat(values))
+
+def invoice_chunks(num_invoices, chunk_invoices):
+    """(chunk number, first invoice, invoice count) for each chunk"""
+    for chunk, start in enumerate(range(0, num_invoices, chunk_invoices)):
+        yield chunk, start, min(chunk_invoices, num_invoices - start)
+
+def chunk_rng(seed, chunk):
+    """Each chunk has its own random stream, so output doesn't depend on worker scheduling"""
+    return np.random.default_rng([seed, chunk])
+
+def draw_invoice_pos(rng, context, count):
+    """First draws of every chunk: which PO each invoice is on and its amount"""
+    invoice_po = context['po_order'][rng.choice(len(context['po_weights']), count, p=context['po_weights'])]
+    amount = np.round(np.clip(rng.lognormal(10, 0.8, count), 500, 500000), 2)
+    return invoice_po, amount
+
+def generate_scale_dimensions(num_invoices, num_vendors, num_pos, seed, chunk_invoices):
+    """
+    Generate the shared tables (projects, budget lines, POs) and the context
+    every invoice chunk needs to reference them.
+
+    POs are sized against what ends up invoiced on them, so this makes a cheap
+    first pass over each chunk's PO/amount draws; roughly a fifth of POs end
+    up over budget.
+    """
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(datetime.now().date(), 'D')
+    num_projects = max(1, num_pos // 10)
+
+    # Vendors and POs
+    vendor_names = scale_ids("Scale Vendor ", num_vendors, 5)
+    vendor_ids = pc.cast(pa.array(1_000_000 + rng.permutation(num_vendors)), pa.string())
+    po_vendor = rng.permutation(np.arange(num_pos) % num_vendors)
+    po_project = rng.integers(0, num_projects, num_pos)
+    po_names = scale_ids("SCALE_PO_", num_pos, 6)
+
+    # Projects and budget lines
+    project_ids = scale_ids("PRJ-SCL-", num_projects, 7)
+    project_numbers = 1_000_000 + np.arange(num_projects)
+    project_companies = rng.choice([COMPANY_CODE, 101, 202], num_projects)
+    projects = pa.table({
+        'Project_Id': project_ids,
+        'Budget_Id': scale_ids("BUD-SCL-", num_projects, 7),
+        'Infinium_Project_Number__c': project_numbers,
+        'Company__c': project_companies,
+        'Infinium_Status__c': pa.array(['Active'] * num_projects),
+        'Approval_Status__c': pa.array(['Infinium Approved'] * num_projects)
+    })
+    budget_project = np.repeat(np.arange(num_projects), 5)
+    budget_amount = np.round(rng.uniform(50000, 200000, len(budget_project)), 2)
+    spent_amount = np.round(rng.uniform(10000, 80000, len(budget_project)), 2)
+    budget_lines = pa.table({
+        'Budget_Line_Id': scale_ids("BUDLN-SCL-", len(budget_project), 8),
+        'Project_Id': project_ids.take(budget_project),
+        'Cost_Category__c': pa.array(COST_CATEGORIES).take(rng.integers(0, len(COST_CATEGORIES), len(budget_project))),
+        'Budget_Amount__c': budget_amount,
+        'Spent_Amount__c': spent_amount,
+        'Remaining_Amount__c': np.round(budget_amount - spent_amount, 2),
+        'Status__c': pa.array(['Active'] * len(budget_project))
+    })
+
+    # A few POs get most of the invoices
+    po_weights = 1.0 / np.arange(1, num_pos + 1) ** 0.8
+    context = {
+        'seed': seed,
+        'today': today,
+        'po_order': rng.permutation(num_pos),
+        'po_weights': po_weights / po_weights.sum(),
+        'po_vendor': po_vendor,
+        'po_project': po_project,
+        'vendor_names': vendor_names,
+        'vendor_ids': vendor_ids,
+        'po_names': po_names,
+        'project_ids': project_ids,
+        'project_numbers': project_numbers,
+        'project_companies': project_companies,
+    }
+
+    invoiced_per_po = np.zeros(num_pos)
+    for chunk, start, count in invoice_chunks(num_invoices, chunk_invoices):
+        invoice_po, amount = draw_invoice_pos(chunk_rng(seed, chunk), context, count)
+        invoiced_per_po += np.bincount(invoice_po, weights=amount, minlength=num_pos)
+    po_amount = np.round(np.maximum(invoiced_per_po * rng.uniform(0.75, 1.6, num_pos), 10000), 2)
+    context['po_overrun'] = po_amount < invoiced_per_po
+    context['po_descriptions'] = concat(vendor_names.take(po_vendor), " - Purchase Order for ", project_ids.take(po_project))
+
+    purchase_orders = pa.table({
+        'PO_Id': scale_ids("PO-SCL-", num_pos, 7),
+        'PO_Name': po_names,
+        'PO_Description__c': context['po_descriptions'],
+        'Vendor__Name': vendor_names.take(po_vendor),
+        'PO_Status__c': pa.array(['Open'] * num_pos),
+        'PO_Amount': po_amount,
+        'LastModifiedDate': dates((today - rng.integers(0, 30, num_pos).astype('timedelta64[D]')).astype('datetime64[s]'))
+    })
+
+    tables = {'projects': projects, 'budget_lines': budget_lines, 'purchase_orders': purchase_orders}
+    return tables, context
+
+def generate_invoice_chunk(context, chunk, start, count):
+    """
+    Generate invoices start..start+count-1 with their lines and integration
+    responses, column-wise with NumPy and Arrow compute (no per-row Python).
+
+    IDs are derived from the global invoice number (line and response IDs
+    are invoice number * 10 + line/attempt), so references stay consistent
+    whichever shard a row lands in.
+    """
+    rng = chunk_rng(context['seed'], chunk)
+    today = context['today']
+    invoice_po, amount = draw_invoice_pos(rng, context, count)
+    invoice_vendor = context['po_vendor'][invoice_po]
+    vendor_names, vendor_ids, po_names = context['vendor_names'], context['vendor_ids'], context['po_names']
+    invoice_numbers = np.arange(start, start + count)
+
+    statuses = list(SCALE_STATUS_WEIGHTS)
+    status_code = rng.choice(len(statuses), count, p=list(SCALE_STATUS_WEIGHTS.values()))
+    is_status = {name: status_code == i for i, name in enumerate(statuses)}
+
+    invoice_date = today - rng.integers(1, 366, count).astype('timedelta64[D]')
+    approved = is_status["Approved"] | is_status["Paid"]
+    approval_date = np.where(
+        approved, invoice_date + rng.integers(3, 11, count).astype('timedelta64[D]'), np.datetime64('NaT', 'D')
+    )
+    days_since_approval = np.maximum((today - np.where(approved, approval_date, today)).astype(int), 0)
+    days_pending = np.select(
+        [is_status["Draft"], is_status["Submitted"], approved],
+        [rng.integers(1, 6, count), rng.integers(5, 16, count), days_since_approval],
+        default=rng.integers(30, 91, count)
+    )
+    last_modified = (
+        np.where(approved, approval_date, invoice_date).astype('datetime64[s]')
+        + rng.integers(0, 86400, count).astype('timedelta64[s]')
+    )
+
+    invoice_ids = numbered_ids("INV-SCL-", invoice_numbers, 9)
+    hold = is_status["Hold"]
+    integration_status = pa.array(np.where(hold, "Fail", np.where(is_status["Paid"], "Success", None)))
+
+    # Hold errors: PO overrun for most holds on over-budget POs, weighted templates otherwise
+    hold_idx = np.flatnonzero(hold)
+    overrun = context['po_overrun'][invoice_po[hold_idx]] & (rng.random(len(hold_idx)) < 0.8)
+    templates = [PO_OVERRUN_ERROR] + list(SCALE_HOLD_ERRORS)
+    template_weights = np.array(list(SCALE_HOLD_ERRORS.values()))
+    choice = np.where(overrun, 0, 1 + rng.choice(len(SCALE_HOLD_ERRORS), len(hold_idx), p=template_weights / template_weights.sum()))
+    fields = {
+        'vendor_id': vendor_ids.take(invoice_vendor[hold_idx]),
+        'invoice': invoice_ids.take(hold_idx),
+        'line': pc.cast(pa.array(rng.integers(1, 9, len(hold_idx))), pa.string()),
+        'gl': concat(
+            pc.cast(pa.array(rng.integers(100, 200, len(hold_idx))), pa.string()), ".000.",
+            pc.cast(pa.array(rng.integers(2000, 7000, len(hold_idx))), pa.string()), ".101.000.345"
+        ),
+    }
+    # Build each template's messages, then put them back in hold order
+    pieces, order = [], []
+    for t, template in enumerate(templates):
+        rows = np.flatnonzero(choice == t)
+        if len(rows):
+            pieces.append(fill_template(template, {k: v.take(rows) for k, v in fields.items()}))
+            order.append(rows)
+    hold_messages = pa.concat_arrays(pieces).take(np.argsort(np.concatenate(order))) if pieces else pa.array([], pa.string())
+    hold_position = np.full(count, -1)
+    hold_position[hold_idx] = np.arange(len(hold_idx))
+    error_message = hold_messages.take(pa.array(hold_position, mask=hold_position < 0))
+
+    invoices = pa.table({
+        'Invoice_Id': invoice_ids,
+        'Invoice_Name': numbered_ids("SCALE-INV-", invoice_numbers, 9),
+        'Vendor__Name': vendor_names.take(invoice_vendor),
+        'PO_Name': po_names.take(invoice_po),
+        'PO_Description__c': context['po_descriptions'].take(invoice_po),
+        'Invoice_Date__c': dates(invoice_date),
+        'Total_Amount__c': amount,
+        'sitetracker__Status__c': pa.array(statuses).take(status_code),
+        'Days_Pending_Approval__c': days_pending,
+        'Integration_Status__c': integration_status,
+        'Integration_Error_Message__c': error_message,
+        'Reason__c': concat("Work completed for ", po_names.take(invoice_po)),
+        'State__c': pa.array(STATES).take(rng.integers(0, len(STATES), count)),
+        'Approval_Date__c': dates(approval_date),
+        'Due_Date_Formula__c': dates(invoice_date + np.timedelta64(30, 'D')),
+        'LastModifiedDate': dates(last_modified)
+    })
+
+    # Invoice lines: 1-8 per invoice, amounts split so they sum to the invoice total
+    line_counts = rng.integers(1, 9, count)
+    line_invoice = np.repeat(np.arange(count), line_counts)
+    line_starts = np.cumsum(line_counts) - line_counts
+    line_number = np.arange(len(line_invoice)) - np.repeat(line_starts, line_counts) + 1
+    line_weights = rng.random(len(line_invoice)) + 0.1
+    line_share = line_weights / np.bincount(line_invoice, weights=line_weights)[line_invoice]
+    line_amount = np.round(amount[line_invoice] * line_share, 2)
+    line_amount[line_starts + line_counts - 1] += np.round(amount - np.bincount(line_invoice, weights=line_amount), 2)
+    quantity = rng.integers(1, 101, len(line_invoice))
+    line_project = context['po_project'][invoice_po[line_invoice]]
+    invoice_lines = pa.table({
+        'Invoice_Line_Id': numbered_ids("INVLN-SCL-", invoice_numbers[line_invoice] * 10 + line_number, 10),
+        'Invoice_Id': invoice_ids.take(line_invoice),
+        'Project_Id': context['project_ids'].take(line_project),
+        'Invoice_Line_Number__c': line_number,
+        'Invoice_Amount__c': np.round(line_amount, 2),
+        'Invoice_Status__c': pa.array(['Approved', 'Pending', 'Review Required']).take(rng.integers(0, 3, len(line_invoice))),
+        'Infinium_Project_Number__c': context['project_numbers'][line_project],
+        'Company_Code__c': context['project_companies'][line_project],
+        'Cost_Category_Name__c': pa.array(COST_CATEGORIES).take(rng.integers(0, len(COST_CATEGORIES), len(line_invoice))),
+        'sitetracker__Quantity__c': quantity,
+        'sitetracker__Unit_Price__c': np.round(line_amount / quantity, 2),
+        'LastModifiedDate': dates(last_modified[line_invoice])
+    })
+
+    # Integration responses: one commit per paid invoice, 1-3 release attempts per hold
+    paid_idx = np.flatnonzero(is_status["Paid"])
+    attempts = rng.integers(1, 4, len(hold_idx))
+    response_invoice = np.concatenate([paid_idx, np.repeat(hold_idx, attempts)])
+    attempt_number = np.concatenate([np.ones(len(paid_idx), dtype=int), np.arange(attempts.sum()) - np.repeat(np.cumsum(attempts) - attempts, attempts) + 1])
+    response_hold = hold[response_invoice]
+    operation = pa.array(np.where(response_hold, "Invoice Release", "Invoice Commit"))
+    response_ids = invoice_ids.take(response_invoice)
+    request = concat(
+        '{"vendor_id": "', vendor_ids.take(invoice_vendor[response_invoice]),
+        '", "vendor_name": "', vendor_names.take(invoice_vendor[response_invoice]),
+        '", "po_number": "', po_names.take(invoice_po[response_invoice]),
+        '", "invoice_id": "', response_ids,
+        '", "amount": ', pc.cast(pa.array(amount[response_invoice]), pa.string()),
+        ', "currency": "USD", "operation": "', operation, '"}'
+    )
+    response = pc.if_else(
+        pa.array(response_hold),
+        concat('{"status": "error", "code": 422, "invoice_id": "', response_ids, '"}'),
+        concat('{"status": "success", "code": 200, "message": "Invoice processed successfully", "invoice_id": "', response_ids, '"}')
+    )
+    integration_responses = pa.table({
+        'Intg_Resp_Id': numbered_ids("RESP-SCL-", invoice_numbers[response_invoice] * 10 + attempt_number, 10),
+        'Invoice_Id': response_ids,
+        'Infinium_Request__c': request,
+        'Infinium_Response__c': response,
+        'Error_Message__c': error_message.take(response_invoice),
+        'Operation__c': operation,
+        'LastModifiedDate': dates(last_modified[response_invoice])
+    })
+
+    return {'invoices': invoices, 'invoice_lines': invoice_lines, 'integration_responses': integration_responses}
+
+def write_shard(table, output_dir, name, shard, file_format='parquet', compression=SCALE_COMPRESSION):
+    """Write one shard as <output_dir>/<name>/part-NNNNN.<format>"""
+    table_dir = os.path.join(output_dir, name)
+    os.makedirs(table_dir, exist_ok=True)
+    filepath = os.path.join(table_dir, f'part-{shard:05d}.{file_format}')
+    if file_format == 'parquet':
+        pq.write_table(table, filepath, compression=compression)
+    else:
+        pa_csv.write_csv(table, filepath)
+    return table.num_rows
+
+def clear_shards(output_dir, names):
+    """Delete part-* shards left in <output_dir>/<name>/ by an earlier run; returns how many"""
+    stale = [
+        path for name in names
+        for path in glob.glob(os.path.join(output_dir, name, 'part-*'))
+    ]
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
+# Set once per worker process by init_scale_worker
+_scale_context = None
+
+def init_scale_worker(context):
+    global _scale_context
+    _scale_context = context
+
+def write_invoice_chunk(chunk, start, count, output_dir, file_format, compression):
+    """Worker: generate one invoice chunk and write it as shard ``chunk`` of each table"""
+    tables = generate_invoice_chunk(_scale_context, chunk, start, count)
+    return {
+        name: write_shard(table, output_dir, name, chunk, file_format, compression)
+        for name, table in tables.items()
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic Hold Busters data")
+    parser.add_argument("--invoices", type=int, help="Scale mode: number of invoices to generate (e.g. 1000000)")
+    parser.add_argument("--vendors", type=int, default=5000, help="Scale mode: number of vendors (default: 5000)")
+    parser.add_argument("--pos", type=int, default=50000, help="Scale mode: number of purchase orders (default: 50000)")
+    parser.add_argument("--seed", type=int, default=42, help="Scale mode: random seed (default: 42)")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="Scale mode: output format (default: parquet)")
+    parser.add_argument("--compression", choices=["zstd", "snappy", "gzip", "none"], default=SCALE_COMPRESSION,
+                        help=f"Scale mode: Parquet compression (default: {SCALE_COMPRESSION})")
+    parser.add_argument("--chunk-invoices", type=int, default=SCALE_CHUNK_INVOICES,
+                        help=f"Scale mode: invoices generated per chunk, one shard per table each (default: {SCALE_CHUNK_INVOICES:,})")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Scale mode: worker processes generating and writing chunks (default: min(4, CPUs))")
+    parser.add_argument("--output-dir", default="synthetic_data_scale", help="Scale mode: output directory (default: synthetic_data_scale)")
+    return parser.parse_args()
+
+def run_scale_mode(args):
+    """
+    Stream the dataset to disk chunk by chunk. Worker processes each generate
+    and write one invoice chunk at a time, so memory stays bounded by
+    ``workers x chunk`` no matter how many invoices are requested.
+    """
+    start = time.perf_counter()
+    chunk_invoices = max(1, args.chunk_invoices)
+    compression = None if args.compression == "none" else args.compression
+    print(f"Generating {args.invoices:,} invoices, {args.vendors:,} vendors, {args.pos:,} POs (seed {args.seed})...")
+
+    tables, context = generate_scale_dimensions(args.invoices, max(1, args.vendors), max(1, args.pos), args.seed, chunk_invoices)
+    row_counts = {name: 0 for name in list(tables) + ['invoices', 'invoice_lines', 'integration_responses']}
+    # A reused output directory may hold more shards from a larger run; readers glob them all
+    removed = clear_shards(args.output_dir, row_counts)
+    if removed:
+        print(f"   Removed {removed:,} shards from a previous run in '{args.output_dir}'")
+    for name, table in tables.items():
+        for shard, offset in enumerate(range(0, max(1, table.num_rows), chunk_invoices)):
+            row_counts[name] += write_shard(table.slice(offset, chunk_invoices), args.output_dir, name, shard, args.format, compression)
+    del tables
+
+    chunks = list(invoice_chunks(args.invoices, chunk_invoices))
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=init_scale_worker, initargs=(context,)) as pool:
+        futures = [
+            pool.submit(write_invoice_chunk, chunk, first, count, args.output_dir, args.format, compression)
+            for chunk, first, count in chunks
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            for name, rows in future.result().items():
+                row_counts[name] += rows
+            print(f"   Wrote chunk {done}/{len(chunks)} ({sum(row_counts.values()):,} rows so far)")
+
+    print("\n" + "=" * 60)
+    print(f"SUCCESS: Scale Data Generation Complete in {time.perf_counter() - start:.1f}s!")
+    print(f"   Shards in '{args.output_dir}/<table>/part-NNNNN.{args.format}'")
+    for name, rows in row_counts.items():
+        print(f"   - {name}: {rows:,}")
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.invoices:
+        run_scale_mode(args)
+        raise SystemExit
+
     # Generate data
     data = generate_all_data(num_invoices_per_status=2)
     
@@ -0,0 +1,173 @@
+"""
+Local DuckDB backend for the Hold Busters dashboard
+
+Loads the bundled CSV exports (or a scale-mode directory written by
+generate_synthetic_data.py) into an in-memory DuckDB database and exposes
+the same cursor interface the app uses from the Databricks connector
+(``execute`` with ``:name`` parameters, ``fetchall_arrow``, ``fetchall``,
+``fetchone``), so every dashboard query runs unchanged and offline.
+
+Select it with ``HOLD_BUSTERS_BACKEND=local`` (and optionally
+``HOLD_BUSTERS_DATA_DIR``), or a ``[local]`` section in secrets.toml.
+"""
+
+import os
+import re
+import threading
+import time
+
+import duckdb
+
+from error_patterns import PATTERNS_TABLE, classify_error_messages
+
+LOCAL_SCHEMA = "local"
+
+# Table -> bundled CSV export. A scale-mode directory has <table lowercased>/part-*.parquet|csv instead.
+LOCAL_TABLES = {
+    'invoices': 'Invoices.csv',
+    'invoice_lines': 'Invoice_Lines.csv',
+    'Integration_Responses': 'Integration_Responses.csv',
+    'Purchase_Orders': 'Purchase_Orders.csv',
+    'projects': 'Projects.csv',
+    'Budget_Lines': 'Budget_Lines.csv'
+}
+
+LINUS_REQUESTS_DDL = """
+CREATE TABLE {schema}.Linus_Requests (
+    Request_Id VARCHAR NOT NULL,
+    Invoice_Id VARCHAR NOT NULL,
+    Invoice_Name VARCHAR,
+    PO_Name VARCHAR,
+    Vendor_Name VARCHAR,
+    Invoice_Amount DOUBLE,
+    Months_Into_Year DOUBLE,
+    Total_Approved_PO DOUBLE,
+    Invoiced_Year_To_Date DOUBLE,
+    Remaining_Balance DOUBLE,
+    Total_Pending DOUBLE,
+    Expected_Additional DOUBLE,
+    Supplemental_Amount DOUBLE,
+    Request_Date TIMESTAMP,
+    Created_By VARCHAR,
+    Status VARCHAR DEFAULT 'Pending',
+    LastModifiedDate TIMESTAMP
+)
+"""
+
+# ``:name`` markers (but not ``::`` casts) -> DuckDB's ``$name``
+PARAM_MARKER = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+def table_source(data_dir, table_name):
+    """DuckDB table function reading one table from ``data_dir``, or None if it isn't there"""
+    csv_path = os.path.join(data_dir, LOCAL_TABLES[table_name])
+    if os.path.exists(csv_path):
+        return f"read_csv('{csv_path}', header = true, encoding = 'utf-8')"
+
+    shard_dir = os.path.join(data_dir, table_name.lower())
+    if os.path.isdir(shard_dir):
+        files = os.listdir(shard_dir)
+        if any(name.endswith('.parquet') for name in files):
+            return f"read_parquet('{shard_dir}/*.parquet')"
+        if any(name.endswith('.csv') for name in files):
+            return f"read_csv('{shard_dir}/*.csv', header = true)"
+    return None
+
+class LocalCursor:
+    """Databricks-connector-shaped cursor over a DuckDB cursor"""
+
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, statement, params=None):
+        # Databricks quotes identifiers with backticks, DuckDB with double quotes
+        statement = statement.replace('`', '"')
+        if params:
+            used = set(PARAM_MARKER.findall(statement))
+            statement = PARAM_MARKER.sub(r"$\1", statement)
+            self._cursor.execute(statement, {name: value for name, value in params.items() if name in used})
+        else:
+            self._cursor.execute(statement)
+        return self
+
+    def fetchall_arrow(self):
+        return self._cursor.fetch_arrow_table()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+class LocalConnection:
+    """
+    In-memory DuckDB database loaded from ``data_dir``.
+
+    DuckDB connections aren't safe to share between threads, so each
+    cursor gets its own connection to the same database. Writes (Linus
+    requests) live only as long as the process.
+    """
+
+    # Already in memory; the app's disk result cache would only add a copy
+    result_cache = False
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+        self._database = duckdb.connect()
+        self._lock = threading.Lock()
+        start = time.perf_counter()
+        self.row_counts = self._load()
+        self.load_seconds = time.perf_counter() - start
+
+    def _load(self):
+        db = self._database
+        db.execute(f"CREATE SCHEMA {LOCAL_SCHEMA}")
+        row_counts = {}
+        for table_name in LOCAL_TABLES:
+            source = table_source(self.data_dir, table_name)
+            if source is None:
+                continue
+            db.execute(f"CREATE TABLE {LOCAL_SCHEMA}.{table_name} AS SELECT * FROM {source}")
+            row_counts[table_name] = db.execute(f"SELECT COUNT(*) FROM {LOCAL_SCHEMA}.{table_name}").fetchone()[0]
+
+        # The CSV export of Purchase_Orders has no amounts; keep the column so PO queries still run
+        if 'Purchase_Orders' in row_counts:
+            columns = {row[0] for row in db.execute(f"DESCRIBE {LOCAL_SCHEMA}.Purchase_Orders").fetchall()}
+            if 'PO_Amount' not in columns:
+                db.execute(f"ALTER TABLE {LOCAL_SCHEMA}.Purchase_Orders ADD COLUMN PO_Amount DOUBLE")
+
+        db.execute(LINUS_REQUESTS_DDL.format(schema=LOCAL_SCHEMA))
+        if 'invoices' in row_counts:
+            self._load_error_patterns()
+        return row_counts
+
+    def _load_error_patterns(self):
+        """Classify every invoice up front, as error_patterns.py does for Databricks"""
+        db = self._database
+        invoices = db.execute(f"""
+        SELECT Invoice_Id, Integration_Error_Message__c, CAST(LastModifiedDate AS TIMESTAMP) as Source_LastModifiedDate
+        FROM {LOCAL_SCHEMA}.invoices
+        """).fetch_df()
+        patterns = invoices[['Invoice_Id', 'Source_LastModifiedDate']].join(
+            classify_error_messages(invoices['Integration_Error_Message__c'])
+        )
+        db.register('classified_patterns', patterns)
+        db.execute(f"""
+        CREATE TABLE {LOCAL_SCHEMA}.{PATTERNS_TABLE} AS
+        SELECT Invoice_Id, Pattern_Id, Error_Pattern, Source_LastModifiedDate, CURRENT_TIMESTAMP as Classified_At
+        FROM classified_patterns
+        """)
+        db.unregister('classified_patterns')
+
+    def cursor(self):
+        with self._lock:
+            return LocalCursor(self._database)
+
+    def close(self):
+        self._database.close()
+
+def connect_local(data_dir="."):
+    """Load ``data_dir`` into a new local database"""
+    return LocalConnection(data_dir)
@@ -0,0 +1,41 @@
+"""
+Tests for scale mode in generate_synthetic_data.py
+
+    python -m pytest test_generate_synthetic_data.py
+"""
+
+import pytest
+
+import app
+from generate_synthetic_data import generate_invoice_chunk, generate_scale_dimensions
+
+# Purchase_Orders columns read by get_po_ledger
+PO_LEDGER_COLUMNS = ['PO_Name', 'PO_Amount', 'Vendor__Name']
+
+def column_names(columns_sql):
+    """Source column names of a SELECT list constant (``a, b as c`` -> ``['a', 'b']``)"""
+    return [column.split()[0] for column in columns_sql.split(',')]
+
+@pytest.fixture(scope='module')
+def scale_tables():
+    tables, context = generate_scale_dimensions(500, 20, 50, seed=7, chunk_invoices=250)
+    tables.update(generate_invoice_chunk(context, 0, 0, 250))
+    return tables
+
+@pytest.mark.parametrize('table_name, columns', [
+    ('invoices', column_names(app.INVOICE_COLUMNS) + [app.CHANGE_COLUMN]),
+    ('invoice_lines', column_names(app.INVOICE_LINE_COLUMNS) + [app.CHANGE_COLUMN]),
+    ('integration_responses', column_names(app.INTEGRATION_RESPONSE_COLUMNS) + [app.CHANGE_COLUMN]),
+    ('projects', column_names(app.PROJECT_COLUMNS)),
+    ('purchase_orders', PO_LEDGER_COLUMNS),
+])
+def test_scale_shards_have_every_column_the_app_selects(scale_tables, table_name, columns):
+    missing = set(columns) - set(scale_tables[table_name].column_names)
+    assert not missing, f"{table_name} shards lack {sorted(missing)}"
+
+def test_line_project_fields_come_from_the_po_project(scale_tables):
+    lines = scale_tables['invoice_lines'].to_pandas()
+    projects = scale_tables['projects'].to_pandas().set_index('Project_Id')
+    expected = projects.loc[lines['Project_Id']]
+    assert (lines['Infinium_Project_Number__c'].to_numpy() == expected['Infinium_Project_Number__c'].to_numpy()).all()
+    assert (lines['Company_Code__c'].to_numpy() == expected['Company__c'].to_numpy()).all()
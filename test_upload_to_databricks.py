@@ -0,0 +1,45 @@
+"""
+Tests for the CSV -> typed Arrow conversion and sync filtering in upload_to_databricks.py
+
+    python -m pytest test_upload_to_databricks.py
+"""
+
+from decimal import Decimal
+
+import pandas as pd
+
+from upload_to_databricks import changed_rows, convert_rows
+
+def convert_decimals(values, data_type):
+    df = pd.DataFrame({'Amount': values}, dtype=str)
+    table, rejected = convert_rows(df, {'Amount': data_type})
+    return table.column('Amount').to_pylist(), rejected
+
+def test_decimal_overflow_is_rejected():
+    values, rejected = convert_decimals(['100000000000000001', '9999999999999999.99'], 'DECIMAL(18,2)')
+    assert values == [Decimal('9999999999999999.99')]
+    assert rejected == {'Amount': 1}
+
+def test_decimal_rounds_half_up_to_scale():
+    values, rejected = convert_decimals(['1.005', '2.004', '-1.005'], 'DECIMAL(18,2)')
+    assert values == [Decimal('1.01'), Decimal('2.00'), Decimal('-1.01')]
+    assert rejected == {}
+
+def test_wide_decimal_keeps_every_digit():
+    wide = '12345678901234567890123456.123456789012'
+    values, rejected = convert_decimals([wide], 'DECIMAL(38,12)')
+    assert values == [Decimal(wide)]
+    assert rejected == {}
+
+def test_unparseable_decimal_is_rejected_and_blank_is_null():
+    values, rejected = convert_decimals(['abc', 'NaN', '', '12.5'], 'DECIMAL(10,2)')
+    assert values == [None, Decimal('12.50')]
+    assert rejected == {'Amount': 2}
+
+def test_sync_always_sends_rows_without_a_modified_date():
+    df = pd.DataFrame({
+        'Invoice_Id': ['old', 'new', 'blank', 'bad'],
+        'LastModifiedDate': ['2025-01-01T00:00:00Z', '2025-03-01T00:00:00Z', '', 'not a date'],
+    }, dtype=str)
+    changed = changed_rows(df, 'invoices', pd.Timestamp('2025-02-01', tz='UTC'))
+    assert changed['Invoice_Id'].tolist() == ['blank', 'bad', 'new']
@@ -4,7 +4,21 @@ Upload synthetic CSV data to Databricks tables
 
 from databricks import sql
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Context, Decimal, InvalidOperation
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import json
 import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
 
 # Read credentials from secrets.toml
 def get_credentials():
@@ -41,48 +55,90 @@ FILES_TO_UPLOAD = {
     'Integration_Responses': 'synthetic_data/integration_responses.csv'
 }
 
-def upload_csv_to_table(connection, csv_file, table_name, schema):
-    """Upload CSV data to Databricks table using batch insert"""
-    
-    print(f"\nUploading {csv_file} to {schema}.{table_name}...")
+# Streaming CSV reads: files are never fully in memory
+CSV_OPTIONS = {'dtype': str, 'keep_default_na': False, 'encoding': 'utf-8-sig'}
+
+def read_csv_columns(csv_file):
+    """Read only the header row of a CSV"""
+    return list(pd.read_csv(csv_file, nrows=0, **CSV_OPTIONS).columns)
+
+def iter_csv_chunks(csv_file, chunk_rows):
+    """Yield a CSV as frames of at most ``chunk_rows`` string rows (empty cells stay '' and are loaded as NULL)"""
+    with pd.read_csv(csv_file, chunksize=chunk_rows, **CSV_OPTIONS) as reader:
+        yield from reader
+
+def prefetch(items, depth):
+    """
+    Iterate ``items`` on a background thread, staying at most ``depth``
+    items ahead, so file reads overlap with network sends.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
     
-    # Read CSV (keep dates as strings, don't parse)
-    df = pd.read_csv(csv_file, dtype=str)  # Read all columns as strings
-    print(f"  Read {len(df)} rows from CSV")
+    def produce():
+        try:
+            for item in items:
+                while not stop.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            buffer.put(done)
+        except Exception as e:
+            buffer.put(e)
     
-    if len(df) == 0:
-        print("  Skipping - no data to upload")
-        return
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Let the reader thread exit if the consumer stops early
+        stop.set()
+
+def sql_literal(value):
+    """Render a typed value as a SQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP'{value.isoformat()}'"
+    if isinstance(value, date):
+        return f"DATE'{value.isoformat()}'"
+    escaped_val = str(value).replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped_val}'"
+
+def insert_rows(connection, table, table_name, schema):
+    """Upload a typed Arrow table to a Databricks table using batched INSERT ... VALUES"""
     
     # Get cursor
     cursor = connection.cursor()
     
     try:
         # Build column names
-        columns = ', '.join([f"`{col}`" for col in df.columns])
+        columns = ', '.join([f"`{col}`" for col in table.column_names])
         
         # Insert rows in batches
         batch_size = 100
-        total_rows = len(df)
         
-        for start_idx in range(0, total_rows, batch_size):
-            end_idx = min(start_idx + batch_size, total_rows)
-            batch = df.iloc[start_idx:end_idx]
-            
-            # Build VALUES for multiple rows
-            value_groups = []
-            for _, row in batch.iterrows():
-                values = []
-                for val in row:
-                    # Handle NaN/None and empty strings
-                    if pd.isna(val) or val == '' or val == 'nan':
-                        values.append('NULL')
-                    else:
-                        # All values are strings now - escape single quotes
-                        escaped_val = str(val).replace("'", "''")
-                        values.append(f"'{escaped_val}'")
-                
-                value_groups.append(f"({', '.join(values)})")
+        for batch in table.to_batches(max_chunksize=batch_size):
+            # Build VALUES for multiple rows (numbers, dates and NULLs go unquoted)
+            value_groups = [
+                f"({', '.join(sql_literal(value) for value in row.values())})"
+                for row in batch.to_pylist()
+            ]
             
             # Build INSERT statement
             values_str = ',\n    '.join(value_groups)
@@ -93,16 +149,465 @@ def upload_csv_to_table(connection, csv_file, table_name, schema):
             """
             
             cursor.execute(insert_query)
-            print(f"  Inserted {end_idx}/{total_rows} rows...")
         
-        print(f"  SUCCESS: Inserted all {len(df)} rows")
+        return table.num_rows
         
-    except Exception as e:
-        print(f"  ERROR: {str(e)}")
-        raise
     finally:
         cursor.close()
 
+# Typed schema: target column types come from schema_registry.json
+# (written by check_schema.py), or from a live DESCRIBE if the table isn't in it
+SCHEMA_REGISTRY_FILE = 'schema_registry.json'
+
+# Databricks column type -> Arrow type (DECIMAL, TIMESTAMP and DATE are converted separately)
+ARROW_TYPES = {
+    'STRING': pa.string(),
+    'BOOLEAN': pa.bool_(),
+    'TINYINT': pa.int8(),
+    'SMALLINT': pa.int16(),
+    'INT': pa.int32(),
+    'BIGINT': pa.int64(),
+    'FLOAT': pa.float32(),
+    'DOUBLE': pa.float64(),
+}
+
+def get_table_columns(cursor, schema, table_name):
+    """Return {column name: Databricks type} for an existing table"""
+    cursor.execute(f"DESCRIBE TABLE {schema}.{table_name}")
+    columns = {}
+    for row in cursor.fetchall():
+        # Partitioning / metadata sections start with a blank or '#' row
+        if not row[0] or row[0].startswith('#'):
+            break
+        columns[row[0]] = row[1].upper()
+    return columns
+
+def load_schema_registry(path=SCHEMA_REGISTRY_FILE):
+    """Return the registry's {schema: {table name (lower-case): {column: type}}}, or {} if there is none"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('schemas', {})
+
+def save_schema_registry(registry, path=SCHEMA_REGISTRY_FILE):
+    with open(path, 'w') as f:
+        json.dump({'schemas': registry, 'described_at': datetime.now().isoformat(timespec='seconds')}, f, indent=2, sort_keys=True)
+
+def resolve_column_types(cursor, registry, schema, table_name):
+    """Column types for a table, from the registry when it has them"""
+    column_types = registry.get(schema, {}).get(table_name.lower())
+    if column_types:
+        return column_types
+    print(f"  {table_name} is not in {SCHEMA_REGISTRY_FILE} - describing it (run check_schema.py to refresh the registry)")
+    return get_table_columns(cursor, schema, table_name)
+
+# Wide enough to quantize any DECIMAL(38, s) value exactly; rounds like a Databricks cast
+DECIMAL_CONTEXT = Context(prec=40, rounding=ROUND_HALF_UP)
+
+def parse_decimal(value, precision, scale):
+    """
+    Parse a CSV cell as DECIMAL(precision, scale), rounded half-up to the
+    scale. Returns None if it isn't a finite number or doesn't fit the precision.
+    """
+    try:
+        number = DECIMAL_CONTEXT.quantize(Decimal(value), Decimal(1).scaleb(-scale))
+    except (InvalidOperation, ValueError):
+        return None
+    if not number.is_finite() or (number and number.adjusted() >= precision - scale):
+        return None
+    return number
+
+def convert_rows(df, column_types):
+    """
+    Parse an all-string CSV chunk into an Arrow table typed like the target table.
+    
+    Returns ``(table, rejected)``. Rows with a value that doesn't parse as its
+    column's type are left out, and ``rejected`` counts them per column.
+    """
+    arrays = []
+    invalid = pd.Series(False, index=df.index)
+    rejected = {}
+    for col in df.columns:
+        values = df[col].where(df[col] != '')
+        data_type = column_types.get(col, 'STRING')
+        base_type = data_type.split('(')[0]
+        
+        if base_type in ('TIMESTAMP', 'TIMESTAMP_NTZ'):
+            converted = pd.to_datetime(values, errors='coerce', utc=True, format='mixed')
+            if base_type == 'TIMESTAMP_NTZ':
+                array = pa.array(converted.dt.tz_localize(None), type=pa.timestamp('us'), from_pandas=True)
+            else:
+                array = pa.array(converted, type=pa.timestamp('us', tz='UTC'), from_pandas=True)
+        elif base_type == 'DATE':
+            converted = pd.to_datetime(values, errors='coerce', format='mixed')
+            array = pa.array(converted, type=pa.timestamp('us'), from_pandas=True).cast(pa.date32())
+        elif base_type == 'DECIMAL':
+            precision, scale = (int(part) for part in data_type[len('DECIMAL('):-1].split(','))
+            # Parsed from the text, not via float64, so wide values keep every digit
+            converted = values.map(lambda value: parse_decimal(value, precision, scale), na_action='ignore')
+            array = pa.array(converted, type=pa.decimal128(precision, scale), from_pandas=True)
+        elif base_type == 'BOOLEAN':
+            converted = values.str.lower().map({'true': True, 'false': False})
+            array = pa.array(converted, type=pa.bool_(), from_pandas=True)
+        elif base_type in ARROW_TYPES and base_type != 'STRING':
+            converted = pd.to_numeric(values, errors='coerce')
+            if pa.types.is_integer(ARROW_TYPES[base_type]):
+                # Fractional values in an integer column are invalid, not truncated
+                converted = converted.where(converted.isna() | (converted % 1 == 0))
+                converted = converted.astype('Int64')
+            array = pa.array(converted, type=ARROW_TYPES[base_type], from_pandas=True)
+        else:
+            # STRING and anything we don't convert (ARRAY, MAP, ...) stay as text
+            converted = values
+            array = pa.array(values, type=pa.string(), from_pandas=True)
+        
+        bad = values.notna() & pd.isna(converted)
+        if bad.any():
+            rejected[col] = int(bad.sum())
+            invalid |= bad
+        arrays.append(array)
+    
+    table = pa.Table.from_arrays(arrays, names=list(df.columns))
+    if invalid.any():
+        table = table.filter(pa.array(~invalid.to_numpy()))
+    return table, rejected
+
+# Bulk load: typed Parquet staged in a Unity Catalog volume, then COPY INTO
+STAGING_DIR = os.path.join(tempfile.gettempdir(), 'hold_busters_staging')
+
+def default_staging_volume(cursor, schema):
+    """
+    Staging volume for the target schema (created by the bulk loader if
+    missing). Volume paths always name the catalog, so a schema without one
+    is resolved against the session's current catalog.
+    """
+    if '.' not in schema:
+        cursor.execute("SELECT current_catalog()")
+        schema = f"{cursor.fetchone()[0]}.{schema}"
+    return f"/Volumes/{schema.replace('.', '/')}/hold_busters_staging"
+
+@contextmanager
+def staged_parquet(cursor, table, table_name, volume):
+    """
+    Write a typed Arrow table as Parquet, PUT it into the staging volume, and
+    yield its path. The staged file is removed again even if the load fails.
+    """
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    file_name = f"{table_name}_{uuid.uuid4().hex}.parquet"
+    local_path = os.path.join(STAGING_DIR, file_name)
+    staged_path = f"{volume}/{file_name}"
+    staged = False
+    
+    try:
+        pq.write_table(table, local_path)
+        # Forward slashes: Windows backslashes would be read as escapes in the SQL string
+        cursor.execute(f"PUT '{Path(local_path).as_posix()}' INTO '{staged_path}' OVERWRITE")
+        staged = True
+        yield staged_path
+    finally:
+        if staged:
+            try:
+                cursor.execute(f"REMOVE '{staged_path}'")
+            except Exception as e:
+                print(f"  Could not remove staged file {staged_path}: {str(e)}")
+        if os.path.exists(local_path):
+            os.remove(local_path)
+
+def bulk_load_rows(connection, table, table_name, schema, volume):
+    """Upload a typed Arrow table with one COPY INTO from a staged Parquet file. Returns the number of rows loaded."""
+    cursor = connection.cursor()
+    try:
+        with staged_parquet(cursor, table, table_name, volume) as staged_path:
+            cursor.execute(f"""
+            COPY INTO {schema}.{table_name}
+            FROM '{staged_path}'
+            FILEFORMAT = PARQUET
+            """)
+        return table.num_rows
+    finally:
+        cursor.close()
+
+# Incremental sync: MERGE rows changed since the last run, checkpointed per batch
+CHECKPOINT_FILE = '.upload_checkpoint.json'
+CHANGE_COLUMN = 'LastModifiedDate'
+DEFAULT_SYNC_BATCH_ROWS = 5000
+
+# Primary ID per table (lower-case names; Databricks table names are case-insensitive)
+PRIMARY_KEYS = {
+    'projects': 'Project_Id',
+    'budget_lines': 'Budget_Line_Id',
+    'invoices': 'Invoice_Id',
+    'invoice_lines': 'Invoice_Line_Id',
+    'integration_responses': 'Intg_Resp_Id',
+    'purchase_orders': 'PO_Id',
+}
+
+class SyncCheckpoint:
+    """
+    Per-table sync state, saved to CHECKPOINT_FILE after every merged batch.
+    
+    A finished table stores its ``high_water_mark``. A table in the middle
+    of a sync also stores ``resume``: how many source rows were already
+    handled, the newest LastModifiedDate seen so far, and a signature of
+    the source file, so a rerun over the same file skips those rows.
+    """
+    
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._state = json.load(f)
+    
+    def get(self, key):
+        return dict(self._state.get(key, {}))
+    
+    def set(self, key, state):
+        with self._lock:
+            self._state[key] = state
+            # Write-then-rename so an interrupted run never leaves a torn file
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def file_signature(csv_file):
+    """Size and modification time, to tell whether a resume point still applies"""
+    stat = os.stat(csv_file)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+def changed_rows(df, table_name, high_water_mark=None):
+    """
+    Rows modified at or after the high-water mark, with the parsed
+    timestamp in a ``_modified`` column (NaT when the CSV has no
+    LastModifiedDate). Only the latest row per primary ID is kept.
+    
+    The mark itself is included: the MERGE is idempotent, so re-sending the
+    rows that share the last checkpointed timestamp is harmless, and no
+    row that shares it can be skipped. For the same reason a row whose
+    LastModifiedDate is blank or unparseable is always sent, since there
+    is no way to tell whether it changed.
+    """
+    primary_key = PRIMARY_KEYS[table_name.lower()]
+    if CHANGE_COLUMN not in df.columns:
+        return df.drop_duplicates(primary_key, keep='last').assign(_modified=pd.NaT)
+    
+    modified = pd.to_datetime(df[CHANGE_COLUMN].where(df[CHANGE_COLUMN] != ''), errors='coerce', utc=True, format='mixed')
+    changed = df.assign(_modified=modified).sort_values('_modified', kind='stable', na_position='first')
+    changed = changed.drop_duplicates(primary_key, keep='last')
+    if high_water_mark is not None:
+        changed = changed[changed['_modified'].isna() | (changed['_modified'] >= high_water_mark)]
+    return changed
+
+def merge_rows(connection, table, table_name, schema, volume):
+    """Upsert a typed Arrow table on the table's primary ID with one MERGE from a staged Parquet file"""
+    primary_key = PRIMARY_KEYS[table_name.lower()]
+    cursor = connection.cursor()
+    try:
+        with staged_parquet(cursor, table, table_name, volume) as staged_path:
+            cursor.execute(f"""
+            MERGE INTO {schema}.{table_name} AS target
+            USING (SELECT * FROM read_files('{staged_path}', format => 'parquet')) AS source
+            ON target.{primary_key} = source.{primary_key}
+            WHEN MATCHED THEN UPDATE SET *
+            WHEN NOT MATCHED THEN INSERT *
+            """)
+        return table.num_rows
+    finally:
+        cursor.close()
+
+def sync_table(pool, progress, checkpoint, table_name, csv_file, schema, volume, column_types, batch_rows, full=False):
+    """
+    Worker: stream one CSV in batches and MERGE the changed rows of each
+    batch, checkpointing after every batch. Batches run in file order, so
+    a rerun after a failure skips exactly the rows already merged.
+    """
+    progress.start(table_name)
+    key = f"{schema}.{table_name}"
+    state = {} if full else checkpoint.get(key)
+    high_water_mark = pd.Timestamp(state['high_water_mark']) if state.get('high_water_mark') else None
+    signature = file_signature(csv_file)
+    
+    resume = state.get('resume') or {}
+    if resume.get('source') != signature:
+        resume = {}
+    skip_rows = resume.get('rows_read', 0)
+    newest = pd.Timestamp(resume['newest']) if resume.get('newest') else high_water_mark
+    if skip_rows:
+        print(f"  [{table_name}] resuming after row {skip_rows:,}")
+    
+    rows_read = 0
+    for chunk in prefetch(iter_csv_chunks(csv_file, batch_rows), depth=2):
+        rows_read += len(chunk)
+        if rows_read <= skip_rows:
+            continue
+        chunk = chunk.iloc[max(0, skip_rows - (rows_read - len(chunk))):]
+        
+        changed = changed_rows(chunk, table_name, high_water_mark)
+        if len(changed):
+            table, rejected = convert_rows(changed.drop(columns='_modified'), column_types)
+            progress.reject(table_name, rejected)
+            with pool.connection() as connection:
+                merge_rows(connection, table, table_name, schema, volume)
+            batch_newest = changed['_modified'].max()
+            if pd.notna(batch_newest) and (newest is None or batch_newest > newest):
+                newest = batch_newest
+        
+        checkpoint.set(key, {
+            'high_water_mark': state.get('high_water_mark'),
+            'resume': {
+                'source': signature,
+                'rows_read': rows_read,
+                'newest': newest.isoformat() if newest is not None else None,
+            },
+        })
+        progress.add(table_name, table.num_rows if len(changed) else 0)
+    
+    # Finished: the next sync starts from the newest change seen in this file
+    checkpoint.set(key, {'high_water_mark': newest.isoformat() if newest is not None else None})
+    progress.finish(table_name)
+
+# Parallel upload: a small connection pool, chunks of every table spread over the workers
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_ROWS = 50000
+
+def connect(creds):
+    """Open a Databricks connection that may PUT files from STAGING_DIR"""
+    return sql.connect(
+        server_hostname=creds['hostname'],
+        http_path=creds['http_path'],
+        access_token=creds['token'],
+        # PUT may only read local files from the staging directory
+        staging_allowed_local_path=STAGING_DIR
+    )
+
+class ConnectionPool:
+    """A fixed set of connections shared by the upload workers"""
+    
+    def __init__(self, creds, size):
+        self._idle = queue.Queue()
+        self._connections = []
+        for _ in range(size):
+            connection = connect(creds)
+            self._connections.append(connection)
+            self._idle.put(connection)
+    
+    @contextmanager
+    def connection(self):
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+    
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+class UploadProgress:
+    """Thread-safe per-table row counts and timings"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.done = {}
+        self.started = {}
+        self.finished = {}
+        self.rejected = {}
+    
+    def start(self, table_name):
+        with self._lock:
+            self.started.setdefault(table_name, time.perf_counter())
+            self.done.setdefault(table_name, 0)
+    
+    def add(self, table_name, rows):
+        with self._lock:
+            self.done[table_name] += rows
+            elapsed = time.perf_counter() - self.started[table_name]
+            print(f"  [{table_name}] {self.done[table_name]:,} rows ({elapsed:.1f}s)")
+    
+    def reject(self, table_name, rejected):
+        with self._lock:
+            for col, count in rejected.items():
+                key = (table_name, col)
+                self.rejected[key] = self.rejected.get(key, 0) + count
+    
+    def finish(self, table_name):
+        with self._lock:
+            self.finished[table_name] = time.perf_counter() - self.started[table_name]
+    
+    def summary(self, wall_time):
+        print(f"\n{'Table':<25} {'Rows':>10} {'Seconds':>9} {'Rows/sec':>10}")
+        print("-" * 57)
+        for table_name, seconds in sorted(self.finished.items(), key=lambda item: -item[1]):
+            rows = self.done[table_name]
+            print(f"{table_name:<25} {rows:>10,} {seconds:>9.1f} {rows / max(seconds, 1e-9):>10,.0f}")
+        total_rows = sum(self.done.values())
+        table_time = sum(self.finished.values())
+        print("-" * 57)
+        print(f"Uploaded {total_rows:,} rows in {wall_time:.1f}s ({total_rows / max(wall_time, 1e-9):,.0f} rows/sec)")
+        print(f"Sum of per-table times: {table_time:.1f}s ({table_time / max(wall_time, 1e-9):.1f}x speedup)")
+        
+        if self.rejected:
+            print(f"\nRejected rows (value doesn't match the column type; a row can count in several columns):")
+            for (table_name, col), count in sorted(self.rejected.items()):
+                print(f"  {table_name}.{col}: {count:,}")
+
+def upload_chunk(pool, progress, load, table_name, chunk, column_types, *load_args):
+    """Worker: convert one chunk to its column types, upload it on a pooled connection, and record progress"""
+    table, rejected = convert_rows(chunk, column_types)
+    progress.reject(table_name, rejected)
+    with pool.connection() as connection:
+        rows = load(connection, table, table_name, *load_args)
+    progress.add(table_name, rows)
+    return rows
+
+def upload_streaming(executor, workers, pool, progress, files_to_upload, chunk_rows, load, load_args):
+    """
+    Stream every CSV through read -> convert/send with at most ``workers``
+    chunks in flight and ``workers`` more read ahead, so peak memory
+    depends on the chunk size, not the file sizes. ``load_args(table_name)``
+    returns the table's column types followed by the extra arguments for ``load``.
+    """
+    def chunks():
+        for table_name, csv_file in files_to_upload:
+            progress.start(table_name)
+            for chunk in iter_csv_chunks(csv_file, chunk_rows):
+                yield table_name, chunk
+            yield table_name, None  # end of table
+    
+    in_flight = {}
+    pending = {}  # table -> chunks still uploading; None once the whole file is read
+    
+    def collect(done_futures):
+        for future in done_futures:
+            table_name = in_flight.pop(future)
+            future.result()
+            pending[table_name] -= 1
+    
+    def finish_tables(read_complete):
+        for table_name in list(read_complete):
+            if pending[table_name] == 0:
+                progress.finish(table_name)
+                read_complete.discard(table_name)
+    
+    read_complete = set()
+    for table_name, chunk in prefetch(chunks(), depth=workers):
+        pending.setdefault(table_name, 0)
+        if chunk is None:
+            read_complete.add(table_name)
+        else:
+            while len(in_flight) >= workers:
+                done_futures, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done_futures)
+            future = executor.submit(upload_chunk, pool, progress, load, table_name, chunk, *load_args(table_name))
+            in_flight[future] = table_name
+            pending[table_name] += 1
+        finish_tables(read_complete)
+    
+    collect(in_flight.copy())
+    finish_tables(read_complete)
+
 def verify_upload(connection, schema, vendor_name="Synthetic Tech Partners 11"):
     """Verify the uploaded data"""
     print(f"\n{'=' * 60}")
@@ -156,7 +661,47 @@ def verify_upload(connection, schema, vendor_name="Synthetic Tech Partners 11"):
     finally:
         cursor.close()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload CSV data to Databricks tables")
+    parser.add_argument(
+        "--mode", choices=["bulk", "insert", "sync"], default="bulk",
+        help="bulk: typed Parquet + COPY INTO (default); insert: batched INSERT ... VALUES; "
+             "sync: MERGE only rows changed since the last sync, resumable"
+    )
+    parser.add_argument(
+        "--volume",
+        help="Unity Catalog volume used to stage Parquet files in bulk mode "
+             "(default: /Volumes/<catalog>/<schema>/hold_busters_staging)"
+    )
+    parser.add_argument(
+        "--table", action="append", metavar="TABLE=CSV",
+        help="Upload this CSV into this table instead of FILES_TO_UPLOAD (repeatable), "
+             "e.g. --table Budget_Lines=Budget_Lines.csv"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS,
+        help=f"Parallel uploads, each with its own connection (default: {DEFAULT_WORKERS}; 1 = one table at a time)"
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+        help=f"Split larger tables into chunks of this many rows that upload in parallel (default: {DEFAULT_CHUNK_ROWS:,})"
+    )
+    parser.add_argument(
+        "--sync-batch-rows", type=int, default=DEFAULT_SYNC_BATCH_ROWS,
+        help=f"Rows per MERGE (and per checkpoint) in sync mode (default: {DEFAULT_SYNC_BATCH_ROWS:,})"
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help=f"In sync mode, ignore the high-water marks in {CHECKPOINT_FILE} and merge every row"
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    files_to_upload = FILES_TO_UPLOAD
+    if args.table:
+        files_to_upload = dict(entry.split('=', 1) for entry in args.table)
+    
     print("=" * 60)
     print("Upload Synthetic Data to Databricks")
     print("=" * 60)
@@ -164,7 +709,7 @@ def main():
     # Check if files exist
     print("\nChecking for CSV files...")
     missing_files = []
-    for table_name, csv_file in FILES_TO_UPLOAD.items():
+    for table_name, csv_file in files_to_upload.items():
         if os.path.exists(csv_file):
             file_size = os.path.getsize(csv_file)
             print(f"  + {csv_file} ({file_size:,} bytes)")
@@ -180,16 +725,14 @@ def main():
     creds = get_credentials()
     
     # Connect to Databricks
+    workers = max(1, args.workers)
     print("\nConnecting to Databricks...")
     print(f"  Host: {creds['hostname']}")
     print(f"  Schema: {creds['schema']}")
+    print(f"  Workers: {workers}")
     
     try:
-        connection = sql.connect(
-            server_hostname=creds['hostname'],
-            http_path=creds['http_path'],
-            access_token=creds['token']
-        )
+        pool = ConnectionPool(creds, workers)
         print("  Connected successfully!")
     except Exception as e:
         print(f"  ERROR: Could not connect to Databricks: {str(e)}")
@@ -197,12 +740,62 @@ def main():
         return
     
     try:
-        # Upload each file
-        for table_name, csv_file in FILES_TO_UPLOAD.items():
-            upload_csv_to_table(connection, csv_file, table_name, creds['schema'])
+        schema = creds['schema']
+        volume = None
+        registry = load_schema_registry()
+        column_types = {}
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            for table_name, csv_file in files_to_upload.items():
+                column_types[table_name] = resolve_column_types(cursor, registry, schema, table_name)
+                unknown = [col for col in read_csv_columns(csv_file) if col not in column_types[table_name]]
+                if unknown:
+                    raise ValueError(f"Columns not in {schema}.{table_name}: {', '.join(unknown)}")
+            if args.mode in ("bulk", "sync"):
+                volume = args.volume or default_staging_volume(cursor, schema)
+                print(f"  Staging volume: {volume}")
+                cursor.execute(f"CREATE VOLUME IF NOT EXISTS {'.'.join(volume.split('/')[2:5])}")
+            cursor.close()
+        
+        if args.mode == "sync":
+            missing_keys = [table_name for table_name in files_to_upload if table_name.lower() not in PRIMARY_KEYS]
+            if missing_keys:
+                raise ValueError(f"No primary key configured for: {', '.join(missing_keys)}")
+        
+        # Largest files first, so they are never the last ones still running
+        ordered_files = sorted(files_to_upload.items(), key=lambda item: -os.path.getsize(item[1]))
+        
+        print(f"\nUploading {len(ordered_files)} tables...")
+        progress = UploadProgress()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if args.mode == "sync":
+                # One job per table: its batches run in file order, so the checkpoint only moves forward
+                checkpoint = SyncCheckpoint()
+                futures = [
+                    executor.submit(
+                        sync_table, pool, progress, checkpoint, table_name, csv_file, schema, volume,
+                        column_types[table_name], max(1, args.sync_batch_rows), args.full
+                    )
+                    for table_name, csv_file in ordered_files
+                ]
+                for future in as_completed(futures):
+                    future.result()
+            elif args.mode == "bulk":
+                upload_streaming(
+                    executor, workers, pool, progress, ordered_files, max(1, args.chunk_rows),
+                    bulk_load_rows, lambda table_name: (column_types[table_name], schema, volume)
+                )
+            else:
+                upload_streaming(
+                    executor, workers, pool, progress, ordered_files, max(1, args.chunk_rows),
+                    insert_rows, lambda table_name: (column_types[table_name], schema)
+                )
+        progress.summary(time.perf_counter() - start)
         
         # Verify upload
-        verify_upload(connection, creds['schema'])
+        with pool.connection() as connection:
+            verify_upload(connection, schema)
         
         print("\n" + "=" * 60)
         print("All data uploaded successfully!")
@@ -217,8 +810,8 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
-        connection.close()
-        print("\nConnection closed")
+        pool.close()
+        print("\nConnections closed")
 
 if __name__ == "__main__":
     # Try to install toml if not present